@@ -0,0 +1,73 @@
+# encoding: utf-8
+'''
+Loading data/airports.csv, airlines.csv and routes.csv: csv.DictReader rows versus the
+columnar loader parsing the csv (cold) versus reloading its memory-mapped sidecar (warm).
+Memory is the peak of python allocations during the load (tracemalloc); the mapped
+sidecar pages live in the OS page cache and are not counted.
+
+    python -m benchmarks.bench_datasets [repeats]
+
+'''
+from __future__ import unicode_literals, division, print_function, absolute_import
+
+import io
+import os
+import csv
+import sys
+import time
+import tracemalloc
+
+from flightstats import datasets
+
+
+def dict_rows(path, _, __):
+    with io.open(path, encoding="utf-8", newline="") as csv_file:
+        return list(csv.DictReader(csv_file))
+
+
+def cold(path, schema, parse_row):
+    return columns(datasets.Table(datasets.parse(path, schema, parse_row), schema))
+
+
+def warm(path, schema, parse_row):
+    return columns(datasets.load(path, schema, parse_row=parse_row))
+
+
+def columns(table):
+    """the table, with a view of every column made"""
+    for name in table.names:
+        table[name]
+    return table
+
+
+def measure(func, path, schema, parse_row, repeats):
+    best = None
+    for _ in range(repeats):
+        start = time.time()
+        func(path, schema, parse_row)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    result = func(path, schema, parse_row)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+    return best, peak
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    print("{:10} {:>8} {:>24} {:>24} {:>24}".format("", "rows", "DictReader", "cold parse", "warm mmap"))
+    for name in ("airports", "airlines", "routes"):
+        path, schema = os.path.join(datasets.DATA_DIRECTORY, name + ".csv"), datasets.SCHEMAS[name]
+        parse_row = datasets.ROW_PARSERS.get(name)
+        datasets.load(path, schema, parse_row=parse_row)  # make sure the sidecar is fresh
+        cells = []
+        for func in (dict_rows, cold, warm):
+            elapsed, peak = measure(func, path, schema, parse_row, repeats)
+            cells.append("{:9.2f} ms {:8.1f} MiB".format(elapsed * 1000, peak / 2 ** 20))
+        print("{:10} {:8} {:>24} {:>24} {:>24}".format(name, len(warm(path, schema, parse_row)), *cells))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+# encoding: utf-8
+'''
+Calls/second of flight_aware() with a bare requests.get() per call versus the pooled
+keep-alive session, against a local mock server.
+
+    python -m benchmarks.bench_http_pool [number_of_calls]
+
+'''
+from __future__ import unicode_literals, division, print_function, absolute_import
+
+import os
+import sys
+import time
+
+os.environ.setdefault('FLIGHTAWARE_USERNAME', 'bench')
+os.environ.setdefault('FLIGHTAWARE_API_KEY', 'bench')
+
+import requests
+from flightstats import flightaware
+from flightstats.http_client import CLIENT
+from flightstats.mock_server import serve, MockUpstream
+
+
+def unpooled_flight_aware(command, params):
+    """the pre-pooling implementation of flight_aware()"""
+    res = requests.get(flightaware.URL + command, auth=(flightaware.USERNAME, flightaware.API_KEY),
+                       params=params, timeout=10)
+    if res.status_code == requests.codes.ok:  # @UndefinedVariable pylint:disable=no-member
+        return res.json()
+
+
+def calls_per_second(func, number_of_calls):
+    start = time.time()
+    for _ in range(number_of_calls):
+        func("AirportInfo", dict(airportCode="KJFK"))
+    return number_of_calls / (time.time() - start)
+
+
+def main():
+    number_of_calls = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    upstream = MockUpstream()
+    upstream.flights  # build the synthetic data before timing
+    server = serve(upstream)
+    flightaware.URL = server.flightxml_url
+    try:
+        before = calls_per_second(unpooled_flight_aware, number_of_calls)
+        after = calls_per_second(flightaware.flight_aware, number_of_calls)
+    finally:
+        CLIENT.close()
+        server.shutdown()
+    print("requests.get per call: {:8.1f} calls/s".format(before))
+    print("pooled session:        {:8.1f} calls/s  ({:.1f}x)".format(after, after / before))
+
+
+if __name__ == '__main__':
+    main()
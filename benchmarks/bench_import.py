@@ -0,0 +1,84 @@
+# encoding: utf-8
+'''
+Start-up cost of `import flightstats.flightaware`: wall-clock time and peak RSS of a fresh
+interpreter importing it, versus one that also builds the airport tables from the python
+dict-literal modules the way the import used to. The cold cases run without any .pyc
+(a new empty PYTHONPYCACHEPREFIX per run, python 3.8+), so the dict-literal modules are compiled
+as on a first start after an install.
+
+    python -m benchmarks.bench_import [repeats]
+
+With warm .pyc files the lazy tables mostly save memory: about 35 -> 30 MB peak RSS, and the
+~13 ms of building the tables, which is within the noise of the import time since
+`requests` dominates it (~70 ms under -X importtime). Without .pyc files the eager import
+also compiles ~13k lines of dict literals, which is where the lazy tables save most: about
+300 ms and 100 -> 36 MB peak RSS here.
+
+'''
+from __future__ import unicode_literals, division, print_function, absolute_import
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MEASURE = '''
+import time, resource, json, sys
+start = time.time()
+{statement}
+elapsed = time.time() - start
+try:  # the peak of this interpreter only - ru_maxrss keeps the parent's peak across fork + exec on linux
+    rss = int([line.split()[1] for line in open("/proc/self/status") if line.startswith("VmHWM:")][0])
+except (IOError, OSError, IndexError):
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss = rss // 1024 if sys.platform == "darwin" else rss
+print(json.dumps(dict(seconds=elapsed, max_rss_kb=rss)))
+'''
+
+CASES = [
+    ("eager tables (before)", "import flightstats.flightaware, flightstats.flightaware_airports, "
+                              "flightstats.airports_icao_to_iata"),
+    ("lazy tables (after)", "import flightstats.flightaware"),
+    ("lazy tables + first lookup", "import flightstats.flightaware as fa; fa.FA_AIRPORTS.get('JFK')"),
+]
+
+
+def measure(statement, repeats, cold=False):
+    """(min seconds, min peak RSS KB) of a fresh interpreter running statement; cold - without any .pyc"""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    env.setdefault('FLIGHTAWARE_USERNAME', 'bench')
+    env.setdefault('FLIGHTAWARE_API_KEY', 'bench')
+    runs = []
+    for _ in range(repeats):
+        pycache = tempfile.mkdtemp() if cold else None
+        if cold:
+            env['PYTHONPYCACHEPREFIX'] = pycache
+        try:
+            runs.append(json.loads(subprocess.check_output(
+                [sys.executable, "-c", MEASURE.format(statement=statement)], env=env).decode('utf-8')))
+        finally:
+            if pycache:
+                shutil.rmtree(pycache)
+    return (min(run['seconds'] for run in runs), min(run['max_rss_kb'] for run in runs))
+
+def cases():
+    """(name, statement, cold) of every case, the cold ones on python 3.8+ only"""
+    warm = [(name, statement, False) for name, statement in CASES]
+    if sys.version_info < (3, 8):
+        return warm
+    return warm + [(name + ", cold", statement, True) for name, statement in CASES[:2]]
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    for name, statement, cold in cases():
+        seconds, max_rss_kb = measure(statement, repeats, cold)
+        print("{:34} {:8.1f} ms {:8d} KB max RSS".format(name, seconds * 1000, max_rss_kb))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+# encoding: utf-8
+'''
+ItineraryFinder.find() versus enumerating every routing depth first and sorting, for
+pairs of the busiest airports in data/routes.csv. The top-k results are checked to agree.
+
+    python -m benchmarks.bench_itineraries [max_legs] [k] [number_of_pairs]
+
+With max_legs=3 the brute force takes over a second per pair (A* about 8 ms).
+
+'''
+from __future__ import unicode_literals, division, print_function, absolute_import
+
+import sys
+import time
+
+from flightstats.itineraries import ItineraryFinder
+
+
+def brute_force(finder, origin, destination, max_legs, k):
+    graph = finder.graph
+    origin_id, destination_id = graph.airport_ids[origin], graph.airport_ids[destination]
+    found = []
+
+    def walk(path, km):
+        if path[-1] == destination_id:
+            found.append((km, tuple(graph.codes[step] for step in path)))
+            return
+        if len(path) > max_legs:
+            return
+        for target in finder.neighbors(path[-1]):
+            if target not in path:
+                walk(path + (target,), km + finder.distance(path[-1], target))
+
+    walk((origin_id,), 0.0)
+    found.sort()
+    return [airports for _, airports in found[:k]]
+
+
+def top_pairs(graph, number_of_pairs):
+    """ordered pairs of the airports with the most routes, busiest first"""
+    hubs = sorted(graph.codes, key=graph.degree, reverse=True)
+    pairs = []
+    for size in range(2, len(hubs) + 1):
+        pairs += [(hub, hubs[size - 1]) for hub in hubs[:size - 1]] + [(hubs[size - 1], hub) for hub in hubs[:size - 1]]
+        if len(pairs) >= number_of_pairs:
+            return pairs[:number_of_pairs]
+    return pairs
+
+
+def main():
+    max_legs = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    number_of_pairs = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    start = time.time()
+    finder = ItineraryFinder()
+    print("loaded {} airports, {} routes in {:.0f} ms".format(
+        len(finder.graph), finder.graph.number_of_routes, (time.time() - start) * 1000))
+    pairs = top_pairs(finder.graph, number_of_pairs)
+
+    times, agree = [], 0
+    for origin, destination in pairs:
+        start = time.time()
+        result = finder.find(origin, destination, max_legs, k)
+        times.append(time.time() - start)
+        expected = brute_force(finder, origin, destination, max_legs, k)
+        agree += [itinerary.airports for itinerary in result] == expected
+    start = time.time()
+    for origin, destination in pairs:
+        brute_force(finder, origin, destination, max_legs, k)
+    brute_time = (time.time() - start) / len(pairs)
+
+    times.sort()
+    print("{} pairs, max_legs={}, k={}".format(len(pairs), max_legs, k))
+    print("A*           mean {:8.2f} ms  p50 {:8.2f} ms  max {:8.2f} ms".format(
+        sum(times) / len(times) * 1000, times[len(times) // 2] * 1000, times[-1] * 1000))
+    print("brute force  mean {:8.2f} ms".format(brute_time * 1000))
+    print("agree {}/{}".format(agree, len(pairs)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+# encoding: utf-8
+'''
+Round trips and wall-clock time of fa_api_scheduled() pulling a big airport with the default
+15 row pages versus pages raised through set_maximum_result_size(), against the mock server
+(flightstats.mock_server) adding a fixed latency per request.
+
+    python -m benchmarks.bench_page_size [number_of_flights] [max_result_size] [latency_ms]
+
+'''
+from __future__ import unicode_literals, division, print_function, absolute_import
+
+import os
+import sys
+import time
+
+os.environ.setdefault('FLIGHTAWARE_USERNAME', 'bench')
+os.environ.setdefault('FLIGHTAWARE_API_KEY', 'bench')
+
+from flightstats import flightaware
+from flightstats.http_client import CLIENT
+from flightstats.mock_server import serve, MockUpstream
+
+AIRPORT = "KATL"
+FLIGHTS_PER_ROUTE = 2  # enough departures from AIRPORT in the 26 hours Scheduled looks at
+
+
+def pull(server, number_of_flights):
+    requests_before = server.requests
+    start = time.time()
+    flights = flightaware.fa_api_scheduled(AIRPORT, how_many=number_of_flights)
+    return len(flights), server.requests - requests_before, time.time() - start
+
+
+def main():
+    number_of_flights = int(sys.argv[1]) if len(sys.argv) > 1 else 1500
+    max_result_size = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    latency = (int(sys.argv[3]) if len(sys.argv) > 3 else 20) / 1000
+    upstream = MockUpstream(latency=latency, flights_per_route=FLIGHTS_PER_ROUTE)
+    upstream.flights  # build the synthetic data before timing
+    server = serve(upstream)
+    flightaware.URL = server.flightxml_url
+    try:
+        results = [("{} rows/page".format(flightaware.MAX_RESULT_SIZE), pull(server, number_of_flights))]
+        flightaware.set_maximum_result_size(max_result_size)
+        results.append(("{} rows/page".format(flightaware.MAX_RESULT_SIZE), pull(server, number_of_flights)))
+    finally:
+        CLIENT.close()
+        server.shutdown()
+    if len(set(flights for _, (flights, _, _) in results)) > 1:
+        # round trips and seconds only compare when both page sizes pulled the same flights
+        raise RuntimeError("the page sizes pulled different numbers of flights: {}".format(
+            ", ".join("{} {}".format(name, flights) for name, (flights, _, _) in results)))
+    for name, (flights, round_trips, seconds) in results:
+        print("{:>14}: {:5d} flights {:4d} round trips {:7.3f}s".format(name, flights, round_trips, seconds))
+
+
+if __name__ == '__main__':
+    main()
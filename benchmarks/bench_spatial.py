@@ -0,0 +1,66 @@
+# encoding: utf-8
+'''
+AirportIndex (k-d tree) versus a brute-force haversine scan over data/airports.csv, for
+nearest(k) and within_radius() queries at random points. Results are checked to agree.
+
+    python -m benchmarks.bench_spatial [number_of_queries]
+
+'''
+from __future__ import unicode_literals, division, print_function, absolute_import
+
+import sys
+import time
+import random
+
+from flightstats.geo import haversine_km
+from flightstats.spatial import AirportIndex
+
+K = 5
+RADIUS_KM = 100
+
+
+def brute_nearest(index, latitude, longitude, k):
+    distances = sorted((haversine_km(latitude, longitude, lat, lon), code)
+                       for code, lat, lon in zip(index.codes, index.latitudes, index.longitudes))
+    return [round(km, 6) for km, _ in distances[:k]]  # distances, so that ties at the k-th place agree
+
+
+def brute_within(index, latitude, longitude, km):
+    return sorted(code for code, lat, lon in zip(index.codes, index.latitudes, index.longitudes)
+                  if haversine_km(latitude, longitude, lat, lon) <= km)
+
+
+def timed(func, queries):
+    start = time.time()
+    results = [func(latitude, longitude) for latitude, longitude in queries]
+    return results, (time.time() - start) / len(queries)
+
+
+def main():
+    number_of_queries = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    start = time.time()
+    index = AirportIndex.from_csv()
+    build = time.time() - start
+    rng = random.Random(42)
+    # half the queries near airports (dense areas), half anywhere
+    queries = [(index.latitudes[i] + rng.uniform(-1, 1), index.longitudes[i] + rng.uniform(-1, 1))
+               for i in (rng.randrange(len(index)) for _ in range(number_of_queries // 2))]
+    queries += [(rng.uniform(-90, 90), rng.uniform(-180, 180)) for _ in range(number_of_queries - len(queries))]
+
+    print("built index of {} airports in {:.1f} ms".format(len(index), build * 1000))
+    for name, tree_query, brute_query in [
+            ("nearest(k={})".format(K),
+             lambda lat, lon: [round(km, 6) for _, km in index.nearest(lat, lon, K)],
+             lambda lat, lon: brute_nearest(index, lat, lon, K)),
+            ("within_radius({} km)".format(RADIUS_KM),
+             lambda lat, lon: sorted(code for code, _ in index.within_radius(lat, lon, RADIUS_KM)),
+             lambda lat, lon: brute_within(index, lat, lon, RADIUS_KM))]:
+        tree_results, tree_time = timed(tree_query, queries)
+        brute_results, brute_time = timed(brute_query, queries)
+        agree = sum(1 for tree, brute in zip(tree_results, brute_results) if tree == brute)
+        print("{:22} k-d tree {:8.1f} us  brute force {:9.1f} us  {:6.1f}x  agree {}/{}".format(
+            name, tree_time * 1e6, brute_time * 1e6, brute_time / tree_time, agree, len(queries)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,343 @@
+# encoding: utf-8
+'''
+The benchmark suite: the FlightXML2/FlightStats clients against the local mock server
+(flightstats.mock_server), the reference lookups and the import, written to a JSON file
+to compare releases with.
+
+    python -m benchmarks.run [--output results.json] [--latency 20] [--quick]
+    python -m benchmarks.run --only pagination,flight_status
+    python -m benchmarks.run --output new.json --compare old.json
+
+Benchmarks:
+    client_throughput  flight_aware() calls/s at several concurrency levels
+    pagination         round trips and seconds of fa_api_scheduled() and fa_api_airline_flight_schedules()
+                       per page size
+    search             flightaware.departures()/arrivals() (Search + FlightInfoEx enrichment) latency
+    schedules          schedules.departures()/arrivals() latency
+    flight_status      get_flight_status_data() latency with and without dates, and its stages
+    lookups            ICAO <-> IATA and airport time zone lookups/s
+    import_time        start-up of `import flightstats.flightaware` (see bench_import)
+
+Latencies are in milliseconds, as p50/p99/mean over the calls. The mock server pretends it
+is NOW and every random choice is seeded, so runs differ only by the machine and the code.
+
+'''
+from __future__ import unicode_literals, division, print_function, absolute_import
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import calendar
+import datetime
+import platform
+import subprocess
+from contextlib import redirect_stdout
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault('FLIGHTAWARE_USERNAME', 'bench')
+os.environ.setdefault('FLIGHTAWARE_API_KEY', 'bench')
+os.environ.setdefault('Flightstats_ID', 'bench')
+os.environ.setdefault('FLIGTHSTATS_Key', 'bench')
+
+from flightstats import flightaware, schedules, timezones
+from flightstats.airport_db import AIRPORTS_ICAO_TO_IATA, AIRPORTS_IATA_TO_ICAO
+from flightstats.http_client import CLIENT
+from flightstats.mock_server import serve, MockUpstream
+from benchmarks import bench_import
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FORMAT_VERSION = 1
+NOW = calendar.timegm((2016, 10, 25, 12, 0, 0))  # the time the mock server pretends it is
+SEED = 1
+HUBS = ["FRA", "JFK", "ATL", "LHR", "DXB", "PEK", "ORD", "CDG"]
+CONCURRENCY_LEVELS = [1, 4, 16, 64]
+PAGE_SIZES = [15, 100, 500]
+FLIGHTS_PER_ROUTE = 2  # a few thousand departures a day at the busiest hubs
+
+
+class Suite(object):
+    """the mock server and the sizes the benchmarks run with"""
+
+    def __init__(self, latency=0.02, error_rate=0.0, quick=False):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.quick = quick
+        self.upstream = MockUpstream(latency=latency, error_rate=error_rate, seed=SEED, now=NOW,
+                                     flights_per_route=FLIGHTS_PER_ROUTE)
+        self.upstream.flights  # build the synthetic data before anything is timed
+        self.server = None
+
+    def __enter__(self):
+        self.server = serve(self.upstream)
+        flightaware.URL = self.server.flightxml_url
+        schedules.URL = self.server.schedules_url
+        CLIENT.configure(pool_maxsize=max(CONCURRENCY_LEVELS))
+        return self
+
+    def __exit__(self, *exc_info):
+        CLIENT.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def scale(self, full, quick):
+        return quick if self.quick else full
+
+    def random(self, name):
+        """a Random seeded per benchmark, so that --only doesn't change the samples"""
+        return random.Random("{}/{}".format(SEED, name))
+
+
+def percentiles(seconds):
+    """p50/p99/mean/max in milliseconds of a list of durations"""
+    ordered = sorted(seconds)
+    if not ordered:
+        return dict(calls=0)
+
+    def rank(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+    return OrderedDict([("calls", len(ordered)), ("p50_ms", rank(0.5)), ("p99_ms", rank(0.99)),
+                        ("mean_ms", sum(ordered) / len(ordered) * 1000), ("max_ms", ordered[-1] * 1000)])
+
+def timed(func, *args, **kwargs):
+    """(result, seconds) of func(*args, **kwargs)"""
+    start = time.time()
+    result = func(*args, **kwargs)
+    return result, time.time() - start
+
+def requests_made(suite, func, *args, **kwargs):
+    """(result, seconds, requests to the mock server) of func(*args, **kwargs)"""
+    before = suite.server.requests
+    result, seconds = timed(func, *args, **kwargs)
+    return result, seconds, suite.server.requests - before
+
+
+def client_throughput(suite):
+    """AirportInfo calls/s through flight_aware(), every concurrent call for another airport"""
+    codes = sorted(suite.upstream.flights.by_icao)
+    suite.random("client_throughput").shuffle(codes)
+    calls = suite.scale(400, 100)
+    results = OrderedDict()
+    for level in CONCURRENCY_LEVELS:
+        params = [dict(airportCode=codes[index % len(codes)]) for index in range(calls)]
+        with ThreadPoolExecutor(max_workers=level) as executor:
+            replies, seconds = timed(lambda: list(executor.map(lambda p: flightaware.flight_aware("AirportInfo", p),
+                                                               params)))
+        results["concurrency_{}".format(level)] = OrderedDict([
+            ("calls", calls), ("calls_per_second", calls / seconds),
+            ("failed", sum(1 for reply in replies if not reply or "AirportInfoResult" not in reply))])
+    return results
+
+
+def pagination(suite):
+    """a big pull per page size (set through SetMaximumResultSize), every page size pulling the same flights"""
+    rows = suite.scale(1500, 300)
+    day = datetime.datetime.utcfromtimestamp(NOW).date()
+    pulls = [("fa_api_scheduled", lambda: flightaware.fa_api_scheduled("KATL", how_many=rows)),
+             ("fa_api_airline_flight_schedules",
+              lambda: flightaware.fa_api_airline_flight_schedules(day, day + datetime.timedelta(days=1), origin="ATL",
+                                                                  how_many=rows))]
+    results = OrderedDict((name, OrderedDict()) for name, _ in pulls)
+    try:
+        for page_size in PAGE_SIZES:
+            flightaware.set_maximum_result_size(page_size)
+            for name, pull in pulls:
+                flights, seconds, round_trips = requests_made(suite, pull)
+                results[name]["page_size_{}".format(page_size)] = OrderedDict([
+                    ("flights", len(flights)), ("round_trips", round_trips), ("seconds", seconds),
+                    ("ms_per_flight", seconds / len(flights) * 1000 if flights else None)])
+    finally:
+        flightaware.set_maximum_result_size(flightaware.DEFAULT_PAGE_SIZE)
+    for name, by_page_size in results.items():
+        _same_flights(name, [(key, result["flights"]) for key, result in by_page_size.items()])
+    return results
+
+def _same_flights(name, counts):
+    """round trips and seconds only compare when every page size pulled the same flights"""
+    if len(set(flights for _, flights in counts)) > 1:
+        raise RuntimeError("{} pulled different numbers of flights per page size: {}".format(
+            name, ", ".join("{} {}".format(key, flights) for key, flights in counts)))
+
+
+def search(suite):
+    """departures()/arrivals() of the hubs: one Search plus a FlightInfoEx per flight found"""
+    rounds = suite.scale(5, 2)
+    results = OrderedDict()
+    for name, func in (("departures", flightaware.departures), ("arrivals", flightaware.arrivals)):
+        seconds, flights, round_trips = [], 0, 0
+        for _ in range(rounds):
+            for hub in HUBS:
+                with redirect_stdout(io.StringIO()):  # search() prints its query
+                    found, elapsed, requests = requests_made(suite, func, hub, number_of_results=15)
+                seconds.append(elapsed)
+                flights += len(found or [])
+                round_trips += requests
+        results[name] = percentiles(seconds)
+        results[name]["flights_per_call"] = flights / len(seconds)
+        results[name]["round_trips_per_call"] = round_trips / len(seconds)
+    return results
+
+
+def _routes(suite, name, count):
+    """count (origin, destination) pairs with flights, drawn from the hubs' routes"""
+    by_route = suite.upstream.flights.by_route
+    routes = sorted(route for route in by_route if route[0] in HUBS)
+    return suite.random(name).sample(routes, min(count, len(routes)))
+
+
+def schedules_latency(suite):
+    """schedules.departures()/arrivals() of hub routes on the mock's day"""
+    day = datetime.datetime.utcfromtimestamp(NOW).date()
+    routes = _routes(suite, "schedules", suite.scale(200, 50))
+    results = OrderedDict()
+    for name, func in (("departures", schedules.departures), ("arrivals", schedules.arrivals)):
+        seconds, flights = [], 0
+        for origin, destination in routes:
+            reply, elapsed = timed(func, origin, destination, day)
+            seconds.append(elapsed)
+            flights += len((reply or {}).get("scheduledFlights") or [])
+        results[name] = percentiles(seconds)
+        results[name]["flights_per_call"] = flights / len(seconds)
+    return results
+
+
+def flight_status(suite):
+    """get_flight_status_data() of sampled flights, by flight number alone and with the departure date"""
+    flights = suite.upstream.flights
+    slots = [slot for slot in flights.slots
+             if slot.operator is None and len(flights.airline_icao(slot.carrier)) == 3 and slot.origin in HUBS]
+    slots = suite.random("flight_status").sample(slots, suite.scale(200, 50))
+    day = datetime.datetime.utcfromtimestamp(NOW).date()
+    results = OrderedDict()
+    for name, dated in (("undated", False), ("dated", True)):
+        seconds, stages, found = [], OrderedDict(), 0
+        for slot in slots:
+            body = dict(ICAO=flights.airline_icao(slot.carrier), Number="{}".format(slot.number), Name=slot.carrier)
+            if dated:
+                body["departure"] = "{}T00:00:00".format(day.isoformat())
+            timings = {}
+            result = flightaware.get_flight_status_data(body, timings=timings)
+            found += result is not None
+            seconds.append(timings["total"])
+            for stage, elapsed in timings.items():
+                if stage != "total":
+                    stages[stage] = stages.get(stage, 0) + elapsed
+        results[name] = percentiles(seconds)
+        results[name]["found"] = found
+        results[name]["stage_mean_ms"] = OrderedDict((stage, elapsed / len(slots) * 1000)
+                                                     for stage, elapsed in sorted(stages.items()))
+    return results
+
+
+def _rate(func, keys, repeats):
+    """func(key) calls/s over keys, best of repeats"""
+    best = None
+    for _ in range(repeats):
+        _, seconds = timed(lambda: [func(key) for key in keys])
+        best = seconds if best is None else min(best, seconds)
+    return len(keys) / best if best else None
+
+def lookups(suite):
+    """lookups/s over every code of the tables (time zones: the first, resolving lookup and the cached ones)"""
+    repeats = suite.scale(5, 2)
+    icao_codes, iata_codes = list(AIRPORTS_ICAO_TO_IATA), list(AIRPORTS_IATA_TO_ICAO)
+    results = OrderedDict([("icao_codes", len(icao_codes)), ("iata_codes", len(iata_codes)),
+                           ("icao_to_iata_per_second", _rate(AIRPORTS_ICAO_TO_IATA.get, icao_codes, repeats)),
+                           ("iata_to_icao_per_second", _rate(AIRPORTS_IATA_TO_ICAO.get, iata_codes, repeats))])
+    timezones._TIMEZONES.clear()  # pylint:disable=protected-access
+    results["airport_timezone_cold_per_second"] = _rate(timezones.airport_timezone, iata_codes, 1)
+    results["airport_timezone_warm_per_second"] = _rate(timezones.airport_timezone, iata_codes, repeats)
+    return results
+
+
+def import_time(suite):
+    """fresh interpreters importing flightstats.flightaware, with and without .pyc files, best of the repeats"""
+    results = OrderedDict()
+    for name, statement, cold in bench_import.cases():
+        seconds, max_rss_kb = bench_import.measure(statement, suite.scale(5, 2), cold)
+        results[name] = OrderedDict([("ms", seconds * 1000), ("max_rss_kb", max_rss_kb)])
+    return results
+
+
+BENCHMARKS = OrderedDict([
+    ("client_throughput", client_throughput),
+    ("pagination", pagination),
+    ("search", search),
+    ("schedules", schedules_latency),
+    ("flight_status", flight_status),
+    ("lookups", lookups),
+    ("import_time", import_time),
+])
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.STDOUT).decode("ascii").strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def flatten(results, prefix=""):
+    """[(dotted name, number)] of the numbers in nested results"""
+    flat = []
+    for key, value in results.items():
+        name = prefix + key
+        if isinstance(value, dict):
+            flat.extend(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat.append((name, value))
+    return flat
+
+def compare(baseline, report):
+    """print every metric of report next to its value in baseline"""
+    before = dict(flatten(baseline["results"]))
+    print("\nversus {} ({})".format(baseline.get("revision") or "unknown revision", baseline.get("started_at")))
+    for name, value in flatten(report["results"]):
+        old = before.get(name)
+        change = "{:+7.1f}%".format((value - old) / old * 100) if old else ""
+        print("  {:70} {:>14} {:>14.4g} {}".format(name, "" if old is None else "{:.4g}".format(old), value, change))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the benchmark suite against the local mock server")
+    parser.add_argument("--output", default="benchmark-results.json", help="JSON file to write the results to")
+    parser.add_argument("--only", help="comma separated benchmarks: " + ", ".join(BENCHMARKS))
+    parser.add_argument("--latency", type=float, default=20, help="milliseconds the mock server adds per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of mock requests failing with 503")
+    parser.add_argument("--quick", action="store_true", help="fewer calls, for a smoke run")
+    parser.add_argument("--compare", help="earlier results JSON to print the changes against")
+    args = parser.parse_args(argv)
+
+    names = [name.strip() for name in args.only.split(",")] if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error("unknown benchmarks: {}".format(", ".join(unknown)))
+
+    report = OrderedDict([
+        ("format_version", FORMAT_VERSION), ("revision", git_revision()),
+        ("started_at", datetime.datetime.utcnow().replace(microsecond=0).isoformat() + "Z"),
+        ("python", sys.version.split()[0]), ("platform", platform.platform()),
+        ("config", OrderedDict([("latency_ms", args.latency), ("error_rate", args.error_rate), ("quick", args.quick),
+                                ("mock_now", NOW), ("flights_per_route", FLIGHTS_PER_ROUTE)])),
+        ("results", OrderedDict())])
+    with Suite(latency=args.latency / 1000, error_rate=args.error_rate, quick=args.quick) as suite:
+        for name in names:
+            result, seconds = timed(BENCHMARKS[name], suite)
+            report["results"][name] = result
+            print("{:18} {:7.1f}s".format(name, seconds))
+            for metric, value in flatten(result):
+                print("    {:60} {:.4g}".format(metric, value))
+
+    with io.open(args.output, "w", encoding="utf-8") as output:
+        output.write(json.dumps(report, indent=2) + "\n")
+    print("wrote", args.output)
+    if args.compare:
+        with io.open(args.compare, encoding="utf-8") as baseline:
+            compare(json.load(baseline), report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,280 @@
+# encoding: utf-8
+'''
+Airport reference tables served from a memory-mapped, columnar binary file.
+
+flightaware_airports.py and airports_icao_to_iata.py hold the tables as big dict literals,
+which every process used to parse and keep on its heap. Here they are packed into one
+read-only file (airports.bin) that is memory-mapped on first access, so all worker
+processes share the same pages from the OS page cache:
+
+    python -m flightstats.airport_db    # rebuild airports.bin after editing the source modules
+
+FA_AIRPORTS            IATA code -> {latitude, longitude, timezone, name, location}
+AIRPORTS_ICAO_TO_IATA  ICAO code -> IATA code ('' when there is none)
+AIRPORTS_IATA_TO_ICAO  IATA code -> ICAO code
+
+File layout (little endian): b"FSAP", version, number of columns, then a directory of
+(24 byte name, offset, length) entries. Columns are either fixed width arrays (float64
+latitudes/longitudes, uint16 time zone ids) or string columns: count, count + 1 uint32
+offsets and the utf-8 bytes. Keys are sorted by their utf-8 bytes and looked up by
+binary search, so nothing is unpacked until asked for.
+
+'''
+from __future__ import unicode_literals, division, print_function, absolute_import
+
+import io
+import os
+import mmap
+import struct
+import threading
+
+try:
+    from collections.abc import Mapping
+except ImportError:  # python 2
+    from collections import Mapping
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "airports.bin")
+MAGIC = b"FSAP"
+VERSION = 1
+_HEADER = struct.Struct("<4sII")
+_DIRECTORY_ENTRY = struct.Struct("<24sII")
+
+
+class StringColumn(object):
+    """count, offsets[count + 1], utf-8 bytes"""
+
+    def __init__(self, buf, offset):
+        self._buf = buf
+        self.count = struct.unpack_from("<I", buf, offset)[0]
+        self._offsets = offset + 4
+        self._data = self._offsets + 4 * (self.count + 1)
+
+    def raw(self, index):
+        start, end = struct.unpack_from("<II", self._buf, self._offsets + 4 * index)
+        return self._buf[self._data + start:self._data + end]
+
+    def __getitem__(self, index):
+        return self.raw(index).decode("utf-8")
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return (self[index] for index in range(self.count))
+
+    def find(self, key):
+        """index of key in a column sorted by utf-8 bytes, or -1"""
+        try:
+            key = key.encode("utf-8")
+        except AttributeError:  # not a string (e.g. None) - never a key
+            return -1
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.raw(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count and self.raw(low) == key:
+            return low
+        return -1
+
+    @staticmethod
+    def pack(strings):
+        encoded = [string.encode("utf-8") for string in strings]
+        offsets = [0]
+        for value in encoded:
+            offsets.append(offsets[-1] + len(value))
+        return struct.pack("<I{}I".format(len(offsets)), len(encoded), *offsets) + b"".join(encoded)
+
+
+class ArrayColumn(object):
+    """fixed width values, struct format code fmt"""
+
+    def __init__(self, buf, offset, fmt):
+        self._buf = buf
+        self._offset = offset
+        self._struct = struct.Struct("<" + fmt)
+
+    def __getitem__(self, index):
+        return self._struct.unpack_from(self._buf, self._offset + self._struct.size * index)[0]
+
+    @staticmethod
+    def pack(fmt, values):
+        return struct.pack("<{}{}".format(len(values), fmt), *values)
+
+
+class Database(object):
+    """the columns of one airports.bin buffer"""
+
+    def __init__(self, buf):
+        magic, version, number_of_columns = _HEADER.unpack_from(buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not an airport database (version {})".format(VERSION))
+        self.buf = buf
+        self.columns = {}
+        for index in range(number_of_columns):
+            name, offset, _ = _DIRECTORY_ENTRY.unpack_from(buf, _HEADER.size + index * _DIRECTORY_ENTRY.size)
+            self.columns[name.rstrip(b"\0").decode("ascii")] = offset
+
+    def strings(self, name):
+        return StringColumn(self.buf, self.columns[name])
+
+    def array(self, name, fmt):
+        return ArrayColumn(self.buf, self.columns[name], fmt)
+
+    @classmethod
+    def open(cls, path):
+        with io.open(path, "rb") as data_file:
+            return cls(mmap.mmap(data_file.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+_DATABASE = []
+_DATABASE_LOCK = threading.Lock()
+
+def database():
+    """the Database, mapped once per process"""
+    if not _DATABASE:
+        with _DATABASE_LOCK:
+            if not _DATABASE:
+                if os.path.exists(DATA_FILE):
+                    _DATABASE.append(Database.open(DATA_FILE))
+                else:  # not built - pack the source modules in memory
+                    _DATABASE.append(Database(pack(*_from_source_modules())))
+    return _DATABASE[0]
+
+
+class AirportTable(Mapping):
+    """Read-only mapping of IATA code -> airport dict, backed by the database"""
+
+    def __init__(self):
+        self._columns = None
+
+    @property
+    def columns(self):
+        if self._columns is None:
+            db = database()
+            self._columns = (db.strings("airport.code"), db.array("airport.latitude", "d"),
+                             db.array("airport.longitude", "d"), db.array("airport.timezone", "H"),
+                             db.strings("timezones"), db.strings("airport.name"), db.strings("airport.location"))
+        return self._columns
+
+    def index(self, code):
+        """row number of code, or -1"""
+        return self.columns[0].find(code)
+
+    def __getitem__(self, code):
+        index = self.index(code)
+        if index < 0:
+            raise KeyError(code)
+        return self.row(index)
+
+    def row(self, index):
+        _, latitudes, longitudes, timezone_ids, timezones, names, locations = self.columns
+        return dict(latitude=latitudes[index], longitude=longitudes[index], timezone=timezones[timezone_ids[index]],
+                    name=names[index], location=locations[index])
+
+    def timezone(self, code):
+        """the time zone name of an airport, or None"""
+        index = self.index(code)
+        if index >= 0:
+            return self.columns[4][self.columns[3][index]]
+
+    def coordinates(self, code):
+        """(latitude, longitude) of an airport, or None"""
+        index = self.index(code)
+        if index >= 0:
+            return self.columns[1][index], self.columns[2][index]
+
+    def __contains__(self, code):
+        return self.index(code) >= 0
+
+    def __iter__(self):
+        codes = self.columns[0]
+        return (codes[index] for index in range(len(codes)))
+
+    def __len__(self):
+        return len(self.columns[0])
+
+
+class CodeTable(Mapping):
+    """Read-only mapping of code -> code, backed by the database"""
+
+    def __init__(self, name):
+        self.name = name
+        self._columns = None
+
+    @property
+    def columns(self):
+        if self._columns is None:
+            db = database()
+            self._columns = (db.strings(self.name + ".key"), db.strings(self.name + ".value"))
+        return self._columns
+
+    def __getitem__(self, code):
+        keys, values = self.columns
+        index = keys.find(code)
+        if index < 0:
+            raise KeyError(code)
+        return values[index]
+
+    def __contains__(self, code):
+        return self.columns[0].find(code) >= 0
+
+    def __iter__(self):
+        keys = self.columns[0]
+        return (keys[index] for index in range(len(keys)))
+
+    def __len__(self):
+        return len(self.columns[0])
+
+
+def _from_source_modules():
+    """the tables straight from the python modules (slow, used to build the data file)"""
+    from flightstats.flightaware_airports import AIRPORTS
+    from flightstats.airports_icao_to_iata import AIRPORTS_ICAO_TO_IATA, AIRPORTS_IATA_TO_ICAO
+    return AIRPORTS, AIRPORTS_ICAO_TO_IATA, AIRPORTS_IATA_TO_ICAO
+
+def _sorted_keys(table):
+    return sorted(table, key=lambda key: key.encode("utf-8"))
+
+def pack(airports, icao_to_iata, iata_to_icao):
+    """the database file contents for the given tables"""
+    codes = _sorted_keys(airports)
+    timezones = sorted(set(airport["timezone"] for airport in airports.values()))
+    timezone_ids = {timezone: index for index, timezone in enumerate(timezones)}
+    columns = [
+        ("airport.latitude", ArrayColumn.pack("d", [airports[code]["latitude"] for code in codes])),
+        ("airport.longitude", ArrayColumn.pack("d", [airports[code]["longitude"] for code in codes])),
+        ("airport.timezone", ArrayColumn.pack("H", [timezone_ids[airports[code]["timezone"]] for code in codes])),
+        ("airport.code", StringColumn.pack(codes)),
+        ("airport.name", StringColumn.pack([airports[code]["name"] for code in codes])),
+        ("airport.location", StringColumn.pack([airports[code]["location"] for code in codes])),
+        ("timezones", StringColumn.pack(timezones)),
+    ]
+    for name, table in (("icao_to_iata", icao_to_iata), ("iata_to_icao", iata_to_icao)):
+        keys = _sorted_keys(table)
+        columns.append((name + ".key", StringColumn.pack(keys)))
+        columns.append((name + ".value", StringColumn.pack([table[key] for key in keys])))
+    directory, body = [], b""
+    offset = _HEADER.size + _DIRECTORY_ENTRY.size * len(columns)
+    for name, data in columns:
+        padding = -(offset + len(body)) % 8  # keep every column 8 byte aligned
+        body += b"\0" * padding
+        directory.append(_DIRECTORY_ENTRY.pack(name.encode("ascii"), offset + len(body), len(data)))
+        body += data
+    return _HEADER.pack(MAGIC, VERSION, len(columns)) + b"".join(directory) + body
+
+def build(path=DATA_FILE):
+    """write the data file from the source modules"""
+    with io.open(path, "wb") as data_file:
+        data_file.write(pack(*_from_source_modules()))
+
+
+FA_AIRPORTS = AirportTable()
+AIRPORTS_ICAO_TO_IATA = CodeTable("icao_to_iata")
+AIRPORTS_IATA_TO_ICAO = CodeTable("iata_to_icao")
+
+if __name__ == '__main__':
+    build()
+    print("wrote", DATA_FILE)
@@ -6794,6 +6794,6 @@ AIRPORTS_ICAO_TO_IATA = {
     "PACK"    :    "CYF",
 }
 
-AIRPORTS_IATA_TO_ICAO = {iata:icao for icao, iata in AIRPORTS_ICAO_TO_IATA.iteritems() if iata}
+AIRPORTS_IATA_TO_ICAO = {iata:icao for icao, iata in AIRPORTS_ICAO_TO_IATA.items() if iata}
 if __name__ == '__main__':
     print(AIRPORTS_IATA_TO_ICAO["HEO"])
@@ -0,0 +1,171 @@
+# encoding: utf-8
+'''
+asyncio front end for the FlightXML2 wrappers in flightstats.flightaware (python 3 only).
+
+Every request still goes through flightaware.flight_aware() and therefore through the
+one pooled requests.Session in flightstats.http_client.CLIENT - the blocking calls run
+on a thread pool sized to the concurrency limit, and an asyncio.Semaphore bounds how
+many are in flight at once.
+
+    async with AsyncFlightAware(max_concurrency=200) as fa:
+        boards = await asyncio.gather(*[fa.search(origin=icao) for icao in airports])
+
+'''
+from __future__ import unicode_literals, division, print_function, absolute_import
+
+import copy
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from flightstats import flightaware
+from flightstats.http_client import CLIENT
+from flightstats.cache import request_key
+
+DEFAULT_MAX_CONCURRENCY = 100
+
+
+class AsyncSingleFlight(object):
+    """asyncio version of flightstats.singleflight.SingleFlight
+
+    The call runs as a task of its own that every caller awaits through asyncio.shield(), so a caller that is
+    cancelled (e.g. by asyncio.wait_for) stops waiting without cancelling the call for the others.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.calls = 0
+        self.joined = 0
+
+    async def do(self, key, coroutine_function):
+        """await coroutine_function(), unless a call for key is already in flight - then return its result"""
+        call = self._calls.get(key)
+        if call is not None:
+            self.joined += 1
+            call[1] += 1
+        else:
+            self.calls += 1
+            call = self._calls[key] = [None, 0]  # [task, number of followers]
+            call[0] = asyncio.ensure_future(self._run(key, call, coroutine_function))
+            call[0].add_done_callback(_retrieve_exception)
+        result = await asyncio.shield(call[0])
+        # with followers every caller gets its own copy, callers are used to modifying their results
+        return copy.deepcopy(result) if call[1] else result
+
+    async def _run(self, key, call, coroutine_function):
+        try:
+            return await coroutine_function()
+        finally:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+
+
+def _retrieve_exception(task):
+    """mark a failed call's exception as retrieved, so asyncio doesn't log it when every caller was cancelled"""
+    if not task.cancelled():
+        task.exception()
+
+
+class AsyncFlightAware(object):
+    """Awaitable equivalents of the flightaware module functions
+
+    max_concurrency - max number of requests in flight. The shared connection pool is
+                      grown to at least this many connections per host.
+    single_flight   - join concurrent identical calls onto one request
+    """
+
+    def __init__(self, max_concurrency=DEFAULT_MAX_CONCURRENCY, client=CLIENT, single_flight=True):
+        self.max_concurrency = max_concurrency
+        self.single_flight = AsyncSingleFlight() if single_flight else None
+        client.grow(max_concurrency)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """stop the worker threads"""
+        self._executor.shutdown(wait=False)
+
+    async def flight_aware(self, command, params):
+        """call a flight aware API, joining identical calls already in flight"""
+        if self.single_flight is not None:
+            return await self.single_flight.do(request_key(command, params),
+                                               functools.partial(self._flight_aware, command, params))
+        return await self._flight_aware(command, params)
+
+    async def _flight_aware(self, command, params):
+        async with self._semaphore:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(self._executor,
+                                              functools.partial(flightaware.flight_aware, command, dict(params)))
+
+    async def airport_info(self, airport_code):
+        """see flightaware.airport_info"""
+        return await self.flight_aware("AirportInfo", dict(airportCode=airport_code))
+
+    async def flight_info_extended(self, faFlightID, departure_date=None, arrival_date=None):
+        """see flightaware.flight_info_extended"""
+        result = await self.flight_aware("FlightInfoEx", dict(ident=faFlightID))
+        return flightaware.filter_flights_by_date(result, departure_date=departure_date, arrival_date=arrival_date)
+
+    async def flight_airline_info(self, faFlightID):
+        """see flightaware.flight_airline_info"""
+        return await self.flight_aware("AirlineFlightInfo", dict(faFlightID=faFlightID))
+
+    async def airline_info(self, icao_code):
+        """see flightaware.airline_info"""
+        return await self.flight_aware("AirlineInfo", dict(airlineCode=icao_code))
+
+    async def find_next_flight(self, flight_number):
+        """see flightaware.find_next_flight"""
+        return await self.flight_aware("InFlightInfo", dict(ident=flight_number))
+
+    async def search(self, destination=None, origin=None, number_of_results=None):
+        """see flightaware.search"""
+        params = flightaware.search_params(destination=destination, origin=origin,
+                                           number_of_results=number_of_results)
+        return await self.flight_aware("Search", params)
+
+    async def fa_api_airline_flight_schedules(self, start_date, end_date, origin=None, destination=None, airline=None,
+                                              flight_number=None, how_many=None):
+        """see flightaware.fa_api_airline_flight_schedules"""
+        scheduled = []
+        how_many = how_many or 15
+        params = flightaware.airline_flight_schedules_params(start_date, end_date, origin=origin,
+                                                             destination=destination, airline=airline,
+                                                             flight_number=flight_number)
+        params['howMany'] = flightaware.page_size(how_many)
+        async for page in self.iter_pages("AirlineFlightSchedules", params, "AirlineFlightSchedulesResult"):
+            scheduled.extend(flightaware.page_rows(page, 'data'))
+            if len(scheduled) >= how_many:
+                break
+        return flightaware.process_airline_flight_schedules(scheduled[:how_many])
+
+    async def fa_api_scheduled(self, airport, how_many, filter_enum="", offset=0, filter_ident=None):
+        """see flightaware.fa_api_scheduled"""
+        scheduled = []
+        params = dict(airport=airport, howMany=flightaware.page_size(how_many), filter=filter_enum, offset=offset)
+        async for page in self.iter_pages("Scheduled", params, "ScheduledResult"):
+            scheduled.extend(flightaware.filter_scheduled(flightaware.page_rows(page, 'scheduled'), filter_ident))
+            if len(scheduled) >= how_many:
+                break
+        return scheduled[:how_many]
+
+    async def iter_pages(self, command, params, result_key):
+        """async generator version of flightaware.iter_pages"""
+        params = dict(params)
+        while True:
+            batch_results = await self.flight_aware(command, params) or {}
+            page = batch_results.get(result_key)
+            if not page or not isinstance(page, dict):
+                return
+            yield page
+            next_offset = flightaware.next_page_offset(page)
+            if next_offset is None:
+                return
+            params['offset'] = next_offset
@@ -0,0 +1,195 @@
+# encoding: utf-8
+'''
+Response cache for flight_aware().
+
+Reference endpoints (AirportInfo, AirlineInfo, AirlineFlightSchedules) return the same
+payload for hours, so they are worth caching. Responses are keyed on the command and
+the normalized parameters and stored as JSON, so every hit hands back a fresh copy that
+the caller may modify.
+
+    from flightstats import flightaware
+    from flightstats.cache import ResponseCache, SqliteBackend
+    flightaware.CACHE = ResponseCache(SqliteBackend("/var/tmp/flightaware.sqlite"))
+
+'''
+from __future__ import unicode_literals, division, print_function, absolute_import
+
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict, Counter
+
+HOUR = 60 * 60
+
+# seconds to keep each command's responses. Commands not listed are not cached.
+DEFAULT_TTLS = {
+    "AirportInfo": 24 * HOUR,
+    "AirlineInfo": 24 * HOUR,
+    "AirlineFlightSchedules": 6 * HOUR,
+}
+# FlightXML refuses calls with 200 OK and an {"error": ...} body - those are kept this long at most
+DEFAULT_ERROR_TTL = 5 * 60
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def request_key(command, params):
+    """identity of an API call: command + params sorted by name, values as text, None values dropped"""
+    normalized = sorted(("{}".format(name), "{}".format(value))
+                        for name, value in (params or {}).items() if value is not None)
+    return json.dumps([command, normalized], separators=(',', ':'))
+
+
+class MemoryBackend(object):
+    """In-process LRU store of (expires_at, value) entries"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """the (expires_at, value) stored under key, or None"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._entries[key] = entry  # most recently used goes last
+            return entry
+
+    def set(self, key, expires_at, value):
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (expires_at, value)
+            self.total_bytes += len(value)
+            while self._entries and (len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes):
+                self._discard(next(iter(self._entries)))
+
+    def delete(self, key):
+        with self._lock:
+            self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= len(entry[1])
+
+
+class SqliteBackend(object):
+    """LRU store in a SQLite file, so the cache survives restarts"""
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS responses ("
+                           "key TEXT PRIMARY KEY, value BLOB, expires_at REAL, accessed_at REAL, size INTEGER)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    @property
+    def total_bytes(self):
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key):
+        """the (expires_at, value) stored under key, or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT expires_at, value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            return row[0], bytes(row[1])
+
+    def set(self, key, expires_at, value):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                               (key, sqlite3.Binary(value), expires_at, time.time(), len(value)))
+            count, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            while count > self.max_entries or size > self.max_bytes:
+                oldest = self._conn.execute("SELECT key, size FROM responses "
+                                            "ORDER BY accessed_at LIMIT 1").fetchone()
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (oldest[0],))
+                count -= 1
+                size -= oldest[1]
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCache(object):
+    """TTL cache of API responses in front of a MemoryBackend or SqliteBackend
+
+    ttls      - {command: seconds}. Commands without a (positive) ttl are never cached.
+    error_ttl - seconds to keep {"error": ...} responses (at most the command's ttl), 0 to not cache them
+    """
+
+    def __init__(self, backend=None, ttls=None, error_ttl=DEFAULT_ERROR_TTL):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.error_ttl = error_ttl
+        self.hits = Counter()
+        self.misses = Counter()
+
+    key = staticmethod(request_key)
+
+    def get(self, command, params):
+        """the cached response or None"""
+        if not self.ttls.get(command):
+            return None
+        key = self.key(command, params)
+        entry = self.backend.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.time():
+                self.hits[command] += 1
+                return json.loads(value.decode('utf-8'))
+            self.backend.delete(key)
+        self.misses[command] += 1
+        return None
+
+    def set(self, command, params, response):
+        """cache a response if command is cacheable"""
+        ttl = self.ttls.get(command)
+        if isinstance(response, dict) and "error" in response:
+            ttl = min(ttl or 0, self.error_ttl)
+        if ttl and response is not None:
+            value = json.dumps(response, separators=(',', ':')).encode('utf-8')
+            self.backend.set(self.key(command, params), time.time() + ttl, value)
+
+    def clear(self):
+        self.backend.clear()
+        self.hits.clear()
+        self.misses.clear()
+
+    def stats(self):
+        """hit/miss counters per command"""
+        return dict(hits=sum(self.hits.values()), misses=sum(self.misses.values()),
+                    by_command={command: dict(hits=self.hits[command], misses=self.misses[command])
+                                for command in set(self.hits) | set(self.misses)},
+                    entries=len(self.backend), bytes=self.backend.total_bytes)
@@ -0,0 +1,271 @@
+# encoding: utf-8
+'''
+Typed, columnar loading of data/airports.csv, data/airlines.csv and data/routes.csv.
+
+    routes = datasets.routes()
+    routes["stops"]                         # int8 column, one value per route
+    routes["airport_st"]                    # int32 codes into...
+    routes.categories("airport_st")         # ...the sorted airport codes (shared with airport_end)
+    routes.strings("airport_st")            # the decoded column as a list
+
+Codes (IATA, ICAO, airline, country, ...) become categorical int32 columns, coordinates
+float32 and ids int32 ("\\N" and empty ids are -1, missing numbers nan, missing strings '').
+Columns are numpy arrays when numpy is installed, else memoryviews (array copies on
+python 2).
+
+Rows must have one value per column. data/airlines.csv leaves out the codes and phone numbers an
+airline doesn't have, so its rows are parsed by their layout (airline_row()). Rows that fit
+no layout are skipped with a warning and counted in Table.rejected - they are never padded or
+cut into the wrong columns.
+
+The parsed table is cached in a binary sidecar next to the csv (routes.csv.columns).
+The sidecar is memory-mapped on later loads and rebuilt when the csv's size or mtime
+changes. Its layout follows airport_db: b"FSDS", version, the csv's size and mtime, the
+number of rows, columns and rejected rows, a directory of (24 byte name, kind, offset, count) entries and
+8 byte aligned columns, string columns in airport_db.StringColumn format.
+
+'''
+from __future__ import unicode_literals, division, print_function, absolute_import
+
+import io
+import os
+import re
+import csv
+import mmap
+import struct
+import warnings
+import threading
+
+from flightstats.airport_db import StringColumn, ArrayColumn
+from flightstats.geo import np
+
+DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+SIDECAR_SUFFIX = ".columns"
+MAGIC = b"FSDS"
+VERSION = 2
+_HEADER = struct.Struct("<4sIqdIII")
+_DIRECTORY_ENTRY = struct.Struct("<24s4sII")
+
+CATEGORY, INT32, INT8, FLAG, FLOAT32 = "category", "i", "b", "flag", "f"
+_TYPECODES = {CATEGORY: "i", INT32: "i", INT8: "b", FLAG: "b", FLOAT32: "f"}
+_NULLS = ("", "\\N")
+
+# (column, kind, category domain) in csv order - columns sharing a domain share their codes
+SCHEMAS = {
+    "airports": [("id", INT32, None), ("name", CATEGORY, "name"), ("city", CATEGORY, "city"),
+                 ("country", CATEGORY, "country"), ("code_iata", CATEGORY, "code_iata"),
+                 ("code_icao", CATEGORY, "code_icao"), ("latitude", FLOAT32, None), ("longitude", FLOAT32, None),
+                 ("altitude", INT32, None), ("tz", FLOAT32, None), ("dst", CATEGORY, "dst"),
+                 ("tz_region", CATEGORY, "tz_region")],
+    "airlines": [("fs", CATEGORY, "fs"), ("iata", CATEGORY, "iata"), ("icao", CATEGORY, "icao"),
+                 ("name", CATEGORY, "name"), ("phone", CATEGORY, "phone"), ("active", CATEGORY, "active")],
+    "routes": [("airline", CATEGORY, "airline"), ("airline_id", INT32, None), ("airport_st", CATEGORY, "airport"),
+               ("airport_st_id", INT32, None), ("airport_end", CATEGORY, "airport"),
+               ("airport_end_id", INT32, None), ("codeshare", FLAG, None), ("stops", INT8, None),
+               ("equipment", CATEGORY, "equipment")],
+}
+
+
+class Table(object):
+    """the columns of one parsed csv, read from a sidecar buffer"""
+
+    def __init__(self, buf, schema):
+        magic, version, self.source_size, self.source_mtime, self.rows, number_of_columns, self.rejected = \
+            _HEADER.unpack_from(buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a dataset sidecar (version {})".format(VERSION))
+        self.buf = buf
+        self.schema = schema
+        self._domains = {name: domain for name, _, domain in schema}
+        self._entries = {}
+        for index in range(number_of_columns):
+            name, kind, offset, count = _DIRECTORY_ENTRY.unpack_from(buf, _HEADER.size + index * _DIRECTORY_ENTRY.size)
+            self._entries[name.rstrip(b"\0").decode("ascii")] = kind.rstrip(b"\0").decode("ascii"), offset, count
+        self._columns = {}
+
+    def __len__(self):
+        return self.rows
+
+    @property
+    def names(self):
+        return [name for name, _, _ in self.schema]
+
+    def __getitem__(self, name):
+        """the column as a typed array (codes for categorical columns)"""
+        column = self._columns.get(name)
+        if column is None:
+            typecode, offset, count = self._entries[name]
+            column = self._columns[name] = _view(self.buf, offset, count, typecode)
+        return column
+
+    def categories(self, name):
+        """the sorted category strings of a categorical column, indexed by its codes"""
+        domain = "categories." + self._domains[name]
+        column = self._columns.get(domain)
+        if column is None:
+            column = self._columns[domain] = StringColumn(self.buf, self._entries[domain][1])
+        return column
+
+    def strings(self, name):
+        """the decoded values of a categorical column"""
+        decoded = list(self.categories(name))
+        return [decoded[code] for code in self[name].tolist()]
+
+
+def _view(buf, offset, count, typecode):
+    """zero-copy typed view of count values in buf"""
+    if np is not None:
+        return np.frombuffer(buf, dtype=np.dtype(str("<") + typecode), count=count, offset=offset)
+    size = struct.calcsize(str("<") + typecode) * count
+    try:
+        return memoryview(buf)[offset:offset + size].cast(str(typecode))
+    except AttributeError:  # python 2 memoryviews cannot be cast
+        from array import array
+        return array(str(typecode), bytes(buf[offset:offset + size]))
+
+
+def _parse_int(value):
+    return int(value) if value not in _NULLS else -1
+
+def _parse_float(value):
+    return float(value) if value not in _NULLS else float("nan")
+
+def _sorted_categories(values):
+    return sorted(set(values), key=lambda value: value.encode("utf-8"))
+
+_AIRLINE_IATA = re.compile(r"^[A-Z0-9]{2}$")
+_AIRLINE_ICAO = re.compile(r"^[A-Z]{3}$")
+
+def airline_row(row):
+    """
+    [fs, iata, icao, name, phone, active] of a data/airlines.csv row, None if it fits no layout.
+    The rows are fs, [iata], [icao], name, [phone], active - an iata or icao value is only taken when it looks
+    like an IATA (2 letters/digits) or ICAO (3 letters) airline code.
+    """
+    if len(row) < 3 or row[-1] not in ("true", "false"):
+        return None
+    fields = row[1:-1]
+    iata = icao = ""
+    if len(fields) > 1 and _AIRLINE_IATA.match(fields[0]):
+        iata, fields = fields[0], fields[1:]
+    if len(fields) > 1 and _AIRLINE_ICAO.match(fields[0]):
+        icao, fields = fields[0], fields[1:]
+    if len(fields) > 2:
+        return None
+    return [row[0], iata, icao, fields[0], fields[1] if len(fields) == 2 else "", row[-1]]
+
+# the csvs whose rows are not simply one value per column: name -> function(row) -> values or None
+ROW_PARSERS = {"airlines": airline_row}
+
+def parse(path, schema, parse_row=None):
+    """
+    the sidecar contents for a csv file. parse_row(row) gives a row's values in schema order (None for
+    malformed rows), by default rows must have exactly one value per column.
+    """
+    with io.open(path, encoding="utf-8", newline="") as csv_file:
+        reader = csv.reader(csv_file)
+        next(reader)  # header - columns are taken by position
+        rows = list(reader)
+    width = len(schema)
+    parsed = [parse_row(row) if parse_row is not None else row if len(row) == width else None for row in rows]
+    rows = [row for row in parsed if row is not None]
+    rejected = len(parsed) - len(rows)
+    if rejected:
+        warnings.warn("{}: skipped {} malformed rows".format(path, rejected))
+
+    raw = {}
+    for index, (name, kind, _) in enumerate(schema):
+        values = [row[index] for row in rows]
+        if kind == CATEGORY:
+            raw[name] = [value if value not in _NULLS else "" for value in values]
+        elif kind == FLOAT32:
+            raw[name] = [_parse_float(value) for value in values]
+        elif kind == FLAG:
+            raw[name] = [1 if value not in _NULLS else 0 for value in values]
+        else:
+            raw[name] = [_parse_int(value) for value in values]
+
+    domains = {}
+    for name, kind, domain in schema:
+        if kind == CATEGORY:
+            domains.setdefault(domain, set()).update(raw[name])
+    domains = {domain: _sorted_categories(values) for domain, values in domains.items()}
+
+    columns = []
+    for name, kind, domain in schema:
+        values = raw[name]
+        if kind == CATEGORY:
+            codes = {category: code for code, category in enumerate(domains[domain])}
+            values = [codes[value] for value in values]
+        columns.append((name, _TYPECODES[kind], len(values), ArrayColumn.pack(_TYPECODES[kind], values)))
+    for domain in sorted(domains):
+        columns.append(("categories." + domain, "s", len(domains[domain]), StringColumn.pack(domains[domain])))
+
+    status = os.stat(path)
+    directory, body = [], b""
+    offset = _HEADER.size + _DIRECTORY_ENTRY.size * len(columns)
+    for name, typecode, count, data in columns:
+        body += b"\0" * (-(offset + len(body)) % 8)  # keep every column 8 byte aligned
+        directory.append(_DIRECTORY_ENTRY.pack(name.encode("ascii"), typecode.encode("ascii"), offset + len(body),
+                                               count))
+        body += data
+    return _HEADER.pack(MAGIC, VERSION, status.st_size, status.st_mtime, len(rows), len(columns), rejected) + \
+        b"".join(directory) + body
+
+
+def _is_fresh(sidecar, path):
+    try:
+        with io.open(sidecar, "rb") as sidecar_file:
+            header = sidecar_file.read(_HEADER.size)
+        magic, version, size, mtime, _, _, _ = _HEADER.unpack(header)
+    except (IOError, OSError, struct.error):
+        return False
+    status = os.stat(path)
+    return magic == MAGIC and version == VERSION and size == status.st_size and mtime == status.st_mtime
+
+
+def load(path, schema, cache=True, parse_row=None):
+    """
+    Table of a csv file. With cache, reuse a fresh sidecar next to the csv or write one (when the
+    directory is writable). parse_row - see parse()
+    """
+    sidecar = path + SIDECAR_SUFFIX
+    if cache and _is_fresh(sidecar, path):
+        with io.open(sidecar, "rb") as sidecar_file:
+            return Table(mmap.mmap(sidecar_file.fileno(), 0, access=mmap.ACCESS_READ), schema)
+    data = parse(path, schema, parse_row)
+    if cache:
+        temporary = "{}.{}.tmp".format(sidecar, os.getpid())
+        try:
+            with io.open(temporary, "wb") as sidecar_file:
+                sidecar_file.write(data)
+            getattr(os, "replace", os.rename)(temporary, sidecar)
+        except (IOError, OSError):  # read-only checkout - parse every time
+            pass
+    return Table(data, schema)
+
+
+_TABLES = {}
+_TABLES_LOCK = threading.Lock()
+
+def _table(name, path):
+    if path is not None:
+        return load(path, SCHEMAS[name], parse_row=ROW_PARSERS.get(name))
+    with _TABLES_LOCK:
+        table = _TABLES.get(name)
+        if table is None:
+            table = _TABLES[name] = load(os.path.join(DATA_DIRECTORY, name + ".csv"), SCHEMAS[name],
+                                         parse_row=ROW_PARSERS.get(name))
+        return table
+
+def airports(path=None):
+    """Table of data/airports.csv, loaded once per process (or of the csv at path)"""
+    return _table("airports", path)
+
+def airlines(path=None):
+    """Table of data/airlines.csv, loaded once per process (or of the csv at path)"""
+    return _table("airlines", path)
+
+def routes(path=None):
+    """Table of data/routes.csv, loaded once per process (or of the csv at path)"""
+    return _table("routes", path)
@@ -10,26 +10,108 @@ Docs are here: https://flightaware.com/commercial/flightxml/documentation2.rvt
 from __future__ import unicode_literals, division, print_function, absolute_import
 
 import os
+import copy
+import time
+import threading
 from pprint import pprint
 import datetime
 import calendar
-from pytz import timezone as pytz_timezone
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
 
 import requests
-from flightstats.airports_icao_to_iata import AIRPORTS_IATA_TO_ICAO, AIRPORTS_ICAO_TO_IATA
-from flightstats.flightaware_airports import AIRPORTS as FA_AIRPORTS
+from flightstats.http_client import CLIENT
+from flightstats.cache import request_key
+from flightstats.singleflight import SingleFlight
+from flightstats.resilience import Resilience, TransientError, TRANSIENT_STATUS_CODES
+from flightstats.airport_db import AIRPORTS_IATA_TO_ICAO, AIRPORTS_ICAO_TO_IATA, FA_AIRPORTS  # pylint:disable=unused-import
+from flightstats.timezones import airport_timezone, local_dates
 
 DEFAULT_NUMBER_OF_SEARCH_RESULTS = 5
+DEFAULT_PAGE_SIZE = 15  # the howMany limit of paginated calls, unless SetMaximumResultSize has been called
+MAX_PARALLEL_ENRICHMENT = 8  # max concurrent FlightInfoEx calls in departures()/arrivals()
+MAX_PARALLEL_STATUS = 16  # max concurrent flight lookups in get_flight_status_data_batch()
+MAX_PIPELINED_CALLS = 16  # max AirlineFlightInfo calls overlapped with other work in resolve_flight_status()
 
 USERNAME = os.environ['FLIGHTAWARE_USERNAME']
 API_KEY = os.environ['FLIGHTAWARE_API_KEY']
 URL = "http://flightxml.flightaware.com/json/FlightXML2/"
 
+CACHE = None  # set to a flightstats.cache.ResponseCache to cache reference endpoints
+
+SINGLE_FLIGHT = SingleFlight()  # joins concurrent identical calls, set to None to disable
+
+RATE_LIMITER = None  # set to a flightstats.ratelimit.RateLimiter to limit and count calls
+
+MAX_RESULT_SIZE = DEFAULT_PAGE_SIZE  # page size of paginated calls, see set_maximum_result_size()
+
+# paginated commands whose pages are fixed by their parameters, so that a journal may replay them.
+# Not Scheduled: it covers a window rolling with the clock, its pages change from one pull to the next
+JOURNALED_COMMANDS = frozenset(["AirlineFlightSchedules"])
+
+# retries transient errors and fails fast (CircuitOpenError) while a command keeps failing. None to disable
+RESILIENCE = Resilience()
+
 def flight_aware(command, params):
-    """call a flight aware API"""
-    res = requests.get(URL + command, auth=(USERNAME, API_KEY), params=params, timeout=10)
+    """call a flight aware API
+    Returns None when the API does not answer with 200 OK, also after retrying transient errors.
+    Timeouts and connection errors are raised once retries are used up, CircuitOpenError while
+    the command is failing."""
+    cache = CACHE
+    if cache is not None:
+        cached = cache.get(command, params)
+        if cached is not None:
+            return cached
+    single_flight = SINGLE_FLIGHT
+    if single_flight is not None:
+        return single_flight.do(request_key(command, params), lambda: _flight_aware(command, params, cache))
+    return _flight_aware(command, params, cache)
+
+def _flight_aware(command, params, cache):
+    """the actual API call, with retries when RESILIENCE is set"""
+    resilience = RESILIENCE
+    try:
+        if resilience is not None:
+            result = resilience.call(command, lambda: _request(command, params))
+        else:
+            result = _request(command, params)
+    except TransientError:
+        return None
+    if result is not None and cache is not None:
+        cache.set(command, params, result)
+    return result
+
+def _request(command, params):
+    """one HTTP request - raises TransientError on replies worth retrying"""
+    rate_limiter = RATE_LIMITER
+    if rate_limiter is not None:
+        rate_limiter.acquire(USERNAME, command)
+    res = CLIENT.get(URL + command, auth=(USERNAME, API_KEY), params=params, timeout=10)
     if res.status_code == requests.codes.ok:  # @UndefinedVariable pylint:disable=no-member
         return res.json()
+    if res.status_code in TRANSIENT_STATUS_CODES:
+        raise TransientError(res)
+
+def set_maximum_result_size(max_size):
+    """
+    Raise the howMany limit of paginated calls for this account (SetMaximumResultSize) so that big pulls need
+    fewer, bigger pages. Paginated calls use pages of up to max_size rows from then on.
+    The API is only called when the size changes. Returns False (and keeps the current size) if the API refused,
+    which FlightXML does with 200 OK and an {"error": ...} body.
+    """
+    global MAX_RESULT_SIZE  # pylint:disable=global-statement
+    if max_size != MAX_RESULT_SIZE:
+        result = flight_aware("SetMaximumResultSize", dict(max_size=max_size))
+        if not isinstance(result, dict) or "SetMaximumResultSizeResult" not in result:
+            return False
+        MAX_RESULT_SIZE = max_size
+    return True
+
+def page_size(how_many=None):
+    """rows per page for a paginated call that wants how_many rows"""
+    if how_many:
+        return min(how_many, MAX_RESULT_SIZE)
+    return MAX_RESULT_SIZE
 
 def airport_info(airport_code):
     """Get airport info
@@ -72,37 +154,25 @@ def flight_info_extended(faFlightID , departure_date=None, arrival_date=None):
     """
     params = dict(ident=faFlightID)
     result = flight_aware("FlightInfoEx", params)
-    if departure_date or arrival_date:
+    return filter_flights_by_date(result, departure_date=departure_date, arrival_date=arrival_date)
+
+def filter_flights_by_date(result, departure_date=None, arrival_date=None):
+    """keep only the flights of a FlightInfoEx result that depart/arrive on the given local dates"""
+    if result and (departure_date or arrival_date):
         flight_info_result = result.get('FlightInfoExResult')
         if flight_info_result and isinstance(flight_info_result, dict):
             flights = flight_info_result.get('flights')
             if flights and isinstance(flights, list):
                 if departure_date:
-                    filtered_flights = []
-                    for flight in flights:
-                        # origin tz
-                        orig_airport_icao_code = flight.get('origin')
-                        orig_airport_code = AIRPORTS_ICAO_TO_IATA.get(orig_airport_icao_code, orig_airport_icao_code)
-                        if orig_airport_code in FA_AIRPORTS:
-                            origin_tz = pytz_timezone(FA_AIRPORTS[orig_airport_code]['timezone'])
-                        else:
-                            origin_tz = None
-                        if datetime.datetime.fromtimestamp(flight.get('filed_departuretime'), origin_tz).date() == departure_date:
-                            filtered_flights.append(flight)
-                    flights = filtered_flights
+                    # in the origin tz
+                    departure_dates = local_dates([flight.get('filed_departuretime') for flight in flights],
+                                                  [flight.get('origin') for flight in flights])
+                    flights = [flight for flight, date in zip(flights, departure_dates) if date == departure_date]
                 if arrival_date:
-                    filtered_flights = []
-                    for flight in flights:
-                        # destination_tz
-                        destination_icao_code = flight.get('destination')
-                        dest_airport_code = AIRPORTS_ICAO_TO_IATA.get(destination_icao_code, destination_icao_code)
-                        if dest_airport_code in FA_AIRPORTS:
-                            destination_tz = pytz_timezone(FA_AIRPORTS[dest_airport_code]['timezone'])
-                        else:
-                            destination_tz = None
-                        if datetime.datetime.fromtimestamp(flight.get('estimatedarrivaltime'), destination_tz).date() == arrival_date:
-                            filtered_flights.append(flight)
-                    flights = filtered_flights
+                    # in the destination tz
+                    arrival_dates = local_dates([flight.get('estimatedarrivaltime') for flight in flights],
+                                                [flight.get('destination') for flight in flights])
+                    flights = [flight for flight, date in zip(flights, arrival_dates) if date == arrival_date]
                 result["FlightInfoExResult"]["flights"] = flights
     return result
 
@@ -209,18 +279,22 @@ def search(destination=None, origin=None, number_of_results=None):
 #     query = "-idents QTR*"
 #     query = "-originOrDestination OTHH"
 #     query = "-destination OTHH"
+    params = search_params(destination=destination, origin=origin, number_of_results=number_of_results)
+    print(params['query'])
+    return flight_aware("Search", params)
+
+def search_params(destination=None, origin=None, number_of_results=None):
+    """build the Search query parameters"""
     queries = []
     if destination:  # icao code
         queries.extend(["-destination", destination])
     if origin:  # icao code
         queries.extend(["-origin", origin])
     query = " ".join(queries)
-    print(query)
     number_of_results = number_of_results or DEFAULT_NUMBER_OF_SEARCH_RESULTS  # Must be a positive integer value less than or equal to 15
-    params = dict(query=query, howMany=number_of_results, offset=0)
-    return flight_aware("Search", params)
+    return dict(query=query, howMany=number_of_results, offset=0)
 
-def departures(airport_code, number_of_results=15):
+def departures(airport_code, number_of_results=15, max_parallel=None):
     """fetch departures - this function is costly"""
     if airport_code:
         icao = AIRPORTS_IATA_TO_ICAO.get(airport_code)
@@ -236,18 +310,10 @@ def departures(airport_code, number_of_results=15):
                             iata = AIRPORTS_ICAO_TO_IATA.get(destination)
                             if iata:
                                 an_aircraft['destination_iata'] = iata
-                        fa_flight_id = an_aircraft.get('faFlightID')
-                        if fa_flight_id:
-                            flight_info = flight_info_extended(fa_flight_id)
-                            if flight_info:
-                                flight_info_ex_results = flight_info.get('FlightInfoExResult')
-                                if flight_info_ex_results and isinstance(flight_info_ex_results, dict):
-                                    flights = flight_info_ex_results.get("flights")
-                                    if flights and isinstance(flights, list):
-                                        an_aircraft['flight_info'] = flights[0]
+                    add_flight_info(aircraft, max_parallel=max_parallel)
                     return aircraft
 
-def arrivals(airport_code, number_of_results=15):
+def arrivals(airport_code, number_of_results=15, max_parallel=None):
     """fetch arrivals - this function is costly"""
     if airport_code:
         icao = AIRPORTS_IATA_TO_ICAO.get(airport_code)
@@ -263,17 +329,26 @@ def arrivals(airport_code, number_of_results=15):
                             iata = AIRPORTS_ICAO_TO_IATA.get(origin)
                             if iata:
                                 an_aircraft['origin_iata'] = iata
-                        fa_flight_id = an_aircraft.get('faFlightID')
-                        if fa_flight_id:
-                            flight_info = flight_info_extended(fa_flight_id)
-                            if flight_info:
-                                flight_info_ex_results = flight_info.get('FlightInfoExResult')
-                                if flight_info_ex_results and isinstance(flight_info_ex_results, dict):
-                                    flights = flight_info_ex_results.get("flights")
-                                    if flights and isinstance(flights, list):
-                                        an_aircraft['flight_info'] = flights[0]
+                    add_flight_info(aircraft, max_parallel=max_parallel)
                     return aircraft
 
+def add_flight_info(aircraft, max_parallel=None):
+    """Add the extended flight info to each search result as 'flight_info'.
+    The FlightInfoEx calls run concurrently, at most max_parallel at a time."""
+    max_parallel = max_parallel or MAX_PARALLEL_ENRICHMENT
+    fa_flight_ids = [an_aircraft.get('faFlightID') for an_aircraft in aircraft]
+    with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+        flight_infos = list(executor.map(lambda fa_flight_id: flight_info_extended(fa_flight_id) if fa_flight_id else None,
+                                         fa_flight_ids))
+    for an_aircraft, flight_info in zip(aircraft, flight_infos):
+        if flight_info:
+            flight_info_ex_results = flight_info.get('FlightInfoExResult')
+            if flight_info_ex_results and isinstance(flight_info_ex_results, dict):
+                flights = flight_info_ex_results.get("flights")
+                if flights and isinstance(flights, list):
+                    an_aircraft['flight_info'] = flights[0]
+    return aircraft
+
 def arrivals_to_texts(airport_code):
     """print arrivals at an airport"""
     results = arrivals(airport_code)
@@ -319,13 +394,13 @@ def departures_to_text(airport_code):
 
 def demo():
     """Play with FlightAware"""
-    res = requests.get(URL + "MetarEx?airport=KJFK&startTime=0&howMany=1&offset=0", auth=(USERNAME, API_KEY))
+    res = CLIENT.get(URL + "MetarEx?airport=KJFK&startTime=0&howMany=1&offset=0", auth=(USERNAME, API_KEY))
     if res.status_code == requests.codes.ok:  # @UndefinedVariable pylint:disable=no-member
         print(res.json())
 
 
 def fa_api_airline_flight_schedules(start_date, end_date, origin=None, destination=None, airline=None, flight_number=None,
-                                    how_many=None):
+                                    how_many=None, prefetch=0):
     """
     AirlineFlightSchedules returns flight schedules that have been published by airlines.
     These schedules are available for the recent past as well as up to one year into the future.
@@ -341,13 +416,44 @@ def fa_api_airline_flight_schedules(start_date, end_date, origin=None, destinati
     airline     string optional airline code of the carrier. If blank or unspecified, then flights on any airline will be returned.
     flightno    string optional flight number. If blank or unspecified, then any flight number will be returned.
     howMany     int    maximum number of past records to obtain. Must be a positive integer value less than or equal to 15,
-                       unless SetMaximumResultSize has been called.
+                       unless SetMaximumResultSize has been called (see set_maximum_result_size()).
     offset      int    must be an integer value of the offset row count you want the search to start at.
                        Most requests should be 0 (most recent report).
+
+    prefetch - number of pages to fetch ahead concurrently, see iter_pages()
     """
     scheduled = []
-    not_done = True
     how_many = how_many or 15
+    params = airline_flight_schedules_params(start_date, end_date, origin=origin, destination=destination,
+                                             airline=airline, flight_number=flight_number)
+    params['howMany'] = page_size(how_many)
+    for page in iter_pages("AirlineFlightSchedules", params, "AirlineFlightSchedulesResult", prefetch=prefetch):
+        scheduled.extend(page_rows(page, 'data'))
+        if len(scheduled) >= how_many:
+            break
+    return process_airline_flight_schedules(scheduled[:how_many])
+
+def iter_airline_flight_schedules(start_date, end_date, origin=None, destination=None, airline=None, flight_number=None,
+                                  rows_per_page=None, prefetch=0, journal=None):
+    """
+    Generator version of fa_api_airline_flight_schedules(): yields the flights of each page as soon as it arrives and
+    only fetches the next page when the consumer asks for more.
+    Flights come in the order of the API (not sorted by departure), codeshares are skipped.
+    rows_per_page - the howMany of each call, defaults to the largest allowed (see set_maximum_result_size())
+    prefetch      - number of pages to fetch ahead concurrently, see iter_pages()
+    journal       - makes the pull resumable, see iter_pages()
+    """
+    params = airline_flight_schedules_params(start_date, end_date, origin=origin, destination=destination,
+                                             airline=airline, flight_number=flight_number)
+    params['howMany'] = page_size(rows_per_page)
+    for page in iter_pages("AirlineFlightSchedules", params, "AirlineFlightSchedulesResult", prefetch=prefetch,
+                           journal=journal):
+        for flight in page_rows(page, 'data'):
+            if not flight['actual_ident']:  # only flight numbers of not co-shared flights
+                yield add_flight_datetimes(flight)
+
+def airline_flight_schedules_params(start_date, end_date, origin=None, destination=None, airline=None, flight_number=None):
+    """build the AirlineFlightSchedules query parameters"""
     params = dict(startDate=calendar.timegm(start_date.timetuple()),
                   endDate=calendar.timegm(end_date.timetuple()),
                   offset=0)
@@ -358,35 +464,113 @@ def fa_api_airline_flight_schedules(start_date, end_date, origin=None, destinati
     if airline:
         params['airline'] = airline
     if flight_number:
-        params['flightno'] = unicode(flight_number)
-    while not_done:
-        batch_results = flight_aware("AirlineFlightSchedules", params)
-        scheduled_result = batch_results.get("AirlineFlightSchedulesResult")
-        if scheduled_result and isinstance(scheduled_result, dict):
-            scheduled_batch = scheduled_result.get('data')
-            if scheduled_batch and isinstance(scheduled_batch, list):
-                scheduled.extend(scheduled_batch)
-            if len(scheduled) > how_many:
-                break
-            next_offset = scheduled_result.get("next_offset")
-            print(next_offset, type(next_offset))
-            if next_offset and isinstance(next_offset, int) and next_offset != -1:
-                params['offset'] = next_offset
-                continue
-        not_done = False
-    # Before we return, let's do some processing on the results:
+        params['flightno'] = "{}".format(flight_number)
+    return params
+
+def add_flight_datetimes(flight):
+    """add departure_time and arrival_time datetimes to an AirlineFlightSchedules flight"""
+    departure_time = flight.get('departuretime')
+    if departure_time:
+        flight['departure_time'] = datetime.datetime.fromtimestamp(departure_time)
+    arrival_time = flight.get('arrivaltime')
+    if arrival_time:
+        flight['arrival_time'] = datetime.datetime.fromtimestamp(arrival_time)
+    return flight
+
+def process_airline_flight_schedules(scheduled):
+    """add datetimes, sort by departure and drop codeshares"""
     for flight in scheduled:
-        departure_time = flight.get('departuretime')
-        if departure_time:
-            flight['departure_time'] = datetime.datetime.fromtimestamp(departure_time)
-        arrival_time = flight.get('arrivaltime')
-        if arrival_time:
-            flight['arrival_time'] = datetime.datetime.fromtimestamp(arrival_time)
+        add_flight_datetimes(flight)
     scheduled = sorted(scheduled, key=lambda res: res.get('departuretime'))
     scheduled = [flight for flight in scheduled if not flight['actual_ident']] # return only flight number of not co-shared flights
     return scheduled
 
-def fa_api_scheduled(airport, how_many, filter_enum="", offset=0, filter_ident=None):
+def iter_pages(command, params, result_key, prefetch=0, journal=None):
+    """
+    Yield the result dicts of a paginated command (the ones holding 'next_offset') page by page.
+    The next page is only requested when the consumer asks for it - unless prefetch is set: then the next
+    `prefetch` pages are fetched concurrently, assuming offsets advance by howMany. Pages speculatively
+    fetched past the last one are dropped (they still cost an API call each).
+    journal - flightstats.journal.Journal: pages are recorded there as they arrive, and pages it already has
+              (from an interrupted earlier pull with the same parameters) are replayed instead of fetched.
+              Only for the JOURNALED_COMMANDS.
+    """
+    if journal is not None and command not in JOURNALED_COMMANDS:
+        raise ValueError("{} pages change over time and cannot be journaled".format(command))
+    fetch = _page_fetcher(command, params, result_key, journal)
+    if prefetch:
+        for page in _iter_pages_prefetching(fetch, params, prefetch):
+            yield page
+        return
+    offset = params.get('offset') or 0
+    while True:
+        page = fetch(offset)
+        if not page or not isinstance(page, dict):
+            return
+        yield page
+        offset = next_page_offset(page)
+        if offset is None:
+            return
+
+def _page_fetcher(command, params, result_key, journal):
+    """fetch(offset) -> the page at offset, going through the journal if there is one"""
+    job = request_key(command, {key: value for key, value in params.items() if key != 'offset'})
+
+    def fetch(offset):
+        if journal is not None:
+            page = journal.get(job, str(offset))
+            if page is not None:
+                return page
+        page = (flight_aware(command, dict(params, offset=offset)) or {}).get(result_key)
+        if journal is not None and page and isinstance(page, dict):
+            journal.record(job, str(offset), page)
+        return page
+    return fetch
+
+def _iter_pages_prefetching(fetch, params, prefetch):
+    """iter_pages() keeping prefetch speculative page requests in flight"""
+    rows_per_page = params.get('howMany') or DEFAULT_PAGE_SIZE
+    pending = deque()  # (offset, future) in page order
+    next_offset = params.get('offset') or 0
+    executor = ThreadPoolExecutor(max_workers=prefetch + 1)
+    try:
+        while True:
+            while len(pending) <= prefetch:
+                pending.append((next_offset, executor.submit(fetch, next_offset)))
+                next_offset += rows_per_page
+            offset, future = pending.popleft()
+            page = future.result()
+            if not page or not isinstance(page, dict):
+                return
+            yield page
+            real_next_offset = next_page_offset(page)
+            if real_next_offset is None:
+                return
+            if real_next_offset != offset + rows_per_page:
+                # offsets don't advance the way we guessed - drop the speculation and restart from the real offset
+                for _, speculative in pending:
+                    speculative.cancel()
+                pending.clear()
+                next_offset = real_next_offset
+    finally:
+        for _, speculative in pending:
+            speculative.cancel()
+        executor.shutdown(wait=False)
+
+def next_page_offset(page):
+    """the offset of the page after this one, None on the last page"""
+    next_offset = page.get("next_offset")
+    if next_offset and isinstance(next_offset, int) and next_offset != -1:
+        return next_offset
+
+def page_rows(page, rows_key):
+    """the list of rows in a page"""
+    rows = page.get(rows_key)
+    if rows and isinstance(rows, list):
+        return rows
+    return []
+
+def fa_api_scheduled(airport, how_many, filter_enum="", offset=0, filter_ident=None, prefetch=0):
     """
     Scheduled returns information about scheduled flights (technically, filed IFR flights) for a specified airport and a
     maximum number of flights to be returned. Scheduled flights are returned from soonest to furthest in the future to depart.
@@ -397,7 +581,8 @@ def fa_api_scheduled(airport, how_many, filter_enum="", offset=0, filter_ident=N
 
     airport   string    the ICAO airport ID (e.g., KLAX, KSFO, KIAH, KHOU, KJFK, KEWR, KORD, KATL, etc.)
     howMany   int       determines the number of results. Must be a positive integer value less than or equal to 15,
-                        unless SetMaximumResultSize has been called.
+                        unless SetMaximumResultSize has been called (see set_maximum_result_size()).
+                        Pages are capped at the allowed size, so asking for more than that fetches several pages.
     filter    string    can be "ga" to show only general aviation traffic, "airline" to only show airline traffic, or null/empty
                         to show all traffic.
     offset    int       must be an integer value of the offset row count you want the search to start at. Most requests should be 0.
@@ -405,6 +590,7 @@ def fa_api_scheduled(airport, how_many, filter_enum="", offset=0, filter_ident=N
     filter_ident - Each result has a flight number that looks like this:   'ident': 'QTR579'.
                    Use filter_ident to filter only 'ident's that start with your provided string.
                    Allows for searching for airlines and even specific flights.
+    prefetch     - number of pages to fetch ahead concurrently, see iter_pages()
 
     Response Example: [{u'aircrafttype': u'AT72',
                   u'destination': u'VICG',
@@ -419,26 +605,30 @@ def fa_api_scheduled(airport, how_many, filter_enum="", offset=0, filter_ident=N
                 ..]
     """
     scheduled = []
-    not_done = True
-    params = dict(airport=airport, howMany=how_many, filter=filter_enum, offset=offset)
-    while not_done:
-        batch_results = flight_aware("Scheduled", params)
-        scheduled_result = batch_results.get("ScheduledResult")
-        if scheduled_result and isinstance(scheduled_result, dict):
-            scheduled_batch = scheduled_result.get('scheduled')
-            if scheduled_batch and isinstance(scheduled_batch, list):
-                if filter_ident:
-                    scheduled_batch = [flight for flight in scheduled_batch if flight.get('ident').startswith(filter_ident)]
-                scheduled.extend(scheduled_batch)
-            if len(scheduled) > how_many:
-                break
-            next_offset = scheduled_result.get("next_offset")
-            print(next_offset, type(next_offset))
-            if next_offset and isinstance(next_offset, int) and next_offset != -1:
-                params['offset'] = next_offset
-                continue
-        not_done = False
-    return scheduled
+    params = dict(airport=airport, howMany=page_size(how_many), filter=filter_enum, offset=offset)
+    for page in iter_pages("Scheduled", params, "ScheduledResult", prefetch=prefetch):
+        scheduled.extend(filter_scheduled(page_rows(page, 'scheduled'), filter_ident))
+        if len(scheduled) >= how_many:
+            break
+    return scheduled[:how_many]
+
+def iter_scheduled(airport, rows_per_page=None, filter_enum="", offset=0, filter_ident=None, prefetch=0):
+    """
+    Generator version of fa_api_scheduled(): yields the flights of each page as soon as it arrives and only fetches
+    the next page when the consumer asks for more.
+    rows_per_page - the howMany of each call, defaults to the largest allowed (see set_maximum_result_size())
+    prefetch      - number of pages to fetch ahead concurrently, see iter_pages()
+    """
+    params = dict(airport=airport, howMany=page_size(rows_per_page), filter=filter_enum, offset=offset)
+    for page in iter_pages("Scheduled", params, "ScheduledResult", prefetch=prefetch):
+        for flight in filter_scheduled(page_rows(page, 'scheduled'), filter_ident):
+            yield flight
+
+def filter_scheduled(scheduled_batch, filter_ident):
+    """keep only flights whose ident starts with filter_ident"""
+    if filter_ident:
+        scheduled_batch = [flight for flight in scheduled_batch if flight.get('ident').startswith(filter_ident)]
+    return scheduled_batch
 
 def get_icao_search_query(airports_list):
     """ icao codes or airports for query """
@@ -480,8 +670,64 @@ def fa_api_arrivals(airport, H):
         offset    int    must be an integer value of the offset row count you want the search to start at. Most requests should be 0.
     """
 
-def get_flight_status_data(body):
-    """ Get data about flight from FlightAware API - and format the output in a FB Flight update format """
+def get_flight_status_data(body, timings=None):
+    """ Get data about flight from FlightAware API - and format the output in a FB Flight update format
+    timings - dict to fill with the seconds spent per stage (see resolve_flight_status()), 'format' and 'total'
+    """
+    start = time.time()
+    flight_number, departure_date, arrival_date = flight_status_query(body)
+    resolved = resolve_flight_status(flight_number, departure_date, arrival_date, timings=timings)
+    if resolved is None:
+        result = None
+    else:
+        extended_info, fa_airline_info = resolved
+        result = _timed(timings, 'format', format_flight_status, body, flight_number, extended_info, fa_airline_info)
+    if timings is not None:
+        timings['total'] = time.time() - start
+    return result
+
+def get_flight_status_data_batch(bodies, max_parallel=None):
+    """
+    get_flight_status_data() for many bodies at once. Bodies asking for the same flight number and dates are
+    looked up once, and the lookups run concurrently, at most max_parallel at a time. Within the batch every
+    API call (InFlightInfo and FlightInfoEx per ident, AirlineFlightInfo per faFlightID) is made once, so
+    bookings of one flight number on different dates share their FlightInfoEx call.
+    Returns the results in the order of bodies. A body whose lookup raised gets the exception instead of a result,
+    the rest of the batch is not affected.
+    """
+    max_parallel = max_parallel or MAX_PARALLEL_STATUS
+    queries = []
+    for body in bodies:
+        try:
+            queries.append(flight_status_query(body))
+        except Exception as error:  # pylint:disable=broad-except
+            queries.append(error)
+    unique_queries = list(OrderedDict.fromkeys(query for query in queries if not isinstance(query, Exception)))
+    memo = CallMemo()
+
+    def resolve(query):
+        try:
+            return resolve_flight_status(*query, memo=memo)
+        except Exception as error:  # pylint:disable=broad-except
+            return error
+
+    with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+        resolved = dict(zip(unique_queries, executor.map(resolve, unique_queries)))
+
+    results = []
+    for body, query in zip(bodies, queries):
+        found = query if isinstance(query, Exception) else resolved[query]
+        if found is None or isinstance(found, Exception):
+            results.append(found)
+            continue
+        try:
+            results.append(format_flight_status(body, query[0], *found))
+        except Exception as error:  # pylint:disable=broad-except
+            results.append(error)
+    return results
+
+def flight_status_query(body):
+    """(flight number, departure date or None, arrival date or None) of a flight status request body"""
     flight_number = '{}{}'.format(body['ICAO'], body['Number'])
     departure_date = body.get('departure', '').split('T')[0]
     if departure_date:
@@ -493,39 +739,112 @@ def get_flight_status_data(body):
         arrival_date = datetime.datetime.strptime(arrival_date, "%Y-%m-%d").date()
     else:
         arrival_date = None
+    return flight_number, departure_date, arrival_date
 
+def resolve_flight_status(flight_number, departure_date=None, arrival_date=None, timings=None, memo=None):
+    """
+    (FlightInfoEx flight, AirlineFlightInfo result) of a flight, None when it can't be found.
+
+    The calls are pipelined: without dates InFlightInfo already gives the faFlightID, so AirlineFlightInfo
+    for it runs concurrently with FlightInfoEx (and is only repeated if FlightInfoEx picks another flight).
+    With dates, AirlineFlightInfo starts as soon as FlightInfoEx has picked the flight, and the airports'
+    time zones are resolved while it is in flight.
+    timings - dict to fill with the seconds spent in 'find_next_flight', 'flight_info_extended',
+              'flight_airline_info' (overlapping the others) and 'timezones'
+    memo    - CallMemo shared by lookups that should make every API call only once
+    """
+    memo = memo if memo is not None else _call
+    executor = _pipeline_executor()
+    airline_info = None  # future of the AirlineFlightInfo call
     if not arrival_date and not departure_date:
-        next_flight = find_next_flight(flight_number)
+        next_flight = _timed(timings, 'find_next_flight', memo, find_next_flight, flight_number)
         if not isinstance(next_flight, dict):
             return
 
         faFlightID = next_flight.get('InFlightInfoResult', {}).get('faFlightID')
         if not faFlightID:
             return
+        airline_info = executor.submit(_timed, timings, 'flight_airline_info', memo, flight_airline_info, faFlightID)
     else:
         faFlightID = flight_number
 
 
-    FlightInfoExResult = flight_info_extended(faFlightID, departure_date=departure_date, arrival_date=arrival_date)
+    # the dates are filtered here, so that one FlightInfoEx call serves every date of the ident
+    FlightInfoExResult = filter_flights_by_date(_timed(timings, 'flight_info_extended', memo, flight_info_extended,
+                                                       faFlightID),
+                                                departure_date=departure_date, arrival_date=arrival_date)
+    if not FlightInfoExResult:
+        return
 
     flights = FlightInfoExResult.get('FlightInfoExResult', {}).get('flights')
     extended_info = flights[0] if flights else None
     if not extended_info:
         return
-    
-    faFlightID = extended_info.get('faFlightID')
-    AirlineFlightInfoResult = flight_airline_info(faFlightID)
+
+    if airline_info is None or extended_info.get('faFlightID') != faFlightID:
+        faFlightID = extended_info.get('faFlightID')
+        airline_info = executor.submit(_timed, timings, 'flight_airline_info', memo, flight_airline_info, faFlightID)
+    _timed(timings, 'timezones', lambda: (airport_timezone(extended_info.get('origin')),
+                                          airport_timezone(extended_info.get('destination'))))
+    AirlineFlightInfoResult = airline_info.result() or {}
     fa_airline_info = AirlineFlightInfoResult.get('AirlineFlightInfoResult', {})
     if not fa_airline_info:
         return
+    return extended_info, fa_airline_info
+
+_PIPELINE = []
+_PIPELINE_LOCK = threading.Lock()
+
+def _pipeline_executor():
+    """the thread pool of resolve_flight_status(), made on first use"""
+    if not _PIPELINE:
+        with _PIPELINE_LOCK:
+            if not _PIPELINE:
+                _PIPELINE.append(ThreadPoolExecutor(max_workers=MAX_PIPELINED_CALLS))
+    return _PIPELINE[0]
 
+def _call(func, *args):
+    return func(*args)
+
+class CallMemo(object):
+    """
+    Calls func(*args) once per (func, args), for the lookups of one batch: concurrent callers of a call in
+    progress wait for it. Every caller gets its own copy of the result (callers modify their results).
+    """
+
+    def __init__(self):
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, func, *args):
+        key = (func.__name__,) + args
+        with self._lock:
+            future = self._futures.get(key)
+            owner = future is None
+            if owner:
+                future = self._futures[key] = Future()
+        if owner:
+            try:
+                future.set_result(func(*args))
+            except Exception as error:  # pylint:disable=broad-except
+                future.set_exception(error)
+        return copy.deepcopy(future.result())
+
+def _timed(timings, stage, func, *args, **kwargs):
+    """func(*args, **kwargs), adding the seconds it took to timings[stage] (if timings isn't None)"""
+    start = time.time()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0) + time.time() - start
+
+def format_flight_status(body, flight_number, extended_info, fa_airline_info):
+    """the FB Flight update dict of a resolved flight"""
     # origin
     orig_airport_icao_code = extended_info.get('origin')
     orig_airport_code = AIRPORTS_ICAO_TO_IATA.get(orig_airport_icao_code, orig_airport_icao_code)
-    if orig_airport_code in FA_AIRPORTS:
-        origin_tz = pytz_timezone(FA_AIRPORTS[orig_airport_code]['timezone'])
-    else:
-        origin_tz = None
+    origin_tz = airport_timezone(orig_airport_icao_code)
     filed_departuretime = extended_info['filed_departuretime']
     actual_departuretime = extended_info.get('actualdeparturetime')
     depart_date = datetime.datetime.fromtimestamp(filed_departuretime, origin_tz)
@@ -535,10 +854,7 @@ def get_flight_status_data(body):
     # destination
     destination_icao_code = extended_info.get('destination')
     dest_airport_code = AIRPORTS_ICAO_TO_IATA.get(destination_icao_code, destination_icao_code)
-    if dest_airport_code in FA_AIRPORTS:
-        destination_tz = pytz_timezone(FA_AIRPORTS[dest_airport_code]['timezone'])
-    else:
-        destination_tz = None
+    destination_tz = airport_timezone(destination_icao_code)
     estimatedarrivaltime = extended_info['estimatedarrivaltime']
     arrival_date = datetime.datetime.fromtimestamp(estimatedarrivaltime, destination_tz)
 
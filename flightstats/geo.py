@@ -0,0 +1,66 @@
+# encoding: utf-8
+'''
+Great-circle geometry on a spherical earth.
+
+The *_array functions work on whole numpy arrays of coordinates at once (numpy is only
+needed for those).
+
+'''
+from __future__ import unicode_literals, division, print_function, absolute_import
+
+from math import radians, degrees, sin, cos, asin, atan2, sqrt
+
+try:
+    import numpy as np
+except ImportError:  # the scalar functions work without numpy
+    np = None
+
+EARTH_RADIUS_KM = 6371.0088  # mean earth radius
+
+def haversine_km(latitude1, longitude1, latitude2, longitude2):
+    """great-circle distance in km between two points given in degrees"""
+    phi1, phi2 = radians(latitude1), radians(latitude2)
+    a = sin((phi2 - phi1) / 2) ** 2 + cos(phi1) * cos(phi2) * sin(radians(longitude2 - longitude1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * asin(min(1.0, sqrt(a)))
+
+def initial_bearing(latitude1, longitude1, latitude2, longitude2):
+    """initial great-circle course in degrees (0 = north, clockwise) from point 1 to point 2"""
+    phi1, phi2 = radians(latitude1), radians(latitude2)
+    delta = radians(longitude2 - longitude1)
+    y = sin(delta) * cos(phi2)
+    x = cos(phi1) * sin(phi2) - sin(phi1) * cos(phi2) * cos(delta)
+    return degrees(atan2(y, x)) % 360
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("numpy is needed for the vectorized great-circle functions")
+
+def haversine_km_array(latitudes1, longitudes1, latitudes2, longitudes2):
+    """like haversine_km(), for arrays of coordinates in degrees (numpy broadcasting applies)"""
+    _require_numpy()
+    phi1, phi2 = np.radians(latitudes1), np.radians(latitudes2)
+    a = np.sin((phi2 - phi1) / 2) ** 2 + \
+        np.cos(phi1) * np.cos(phi2) * np.sin(np.radians(np.subtract(longitudes2, longitudes1)) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+def initial_bearing_array(latitudes1, longitudes1, latitudes2, longitudes2):
+    """like initial_bearing(), for arrays of coordinates in degrees"""
+    _require_numpy()
+    phi1, phi2 = np.radians(latitudes1), np.radians(latitudes2)
+    delta = np.radians(np.subtract(longitudes2, longitudes1))
+    y = np.sin(delta) * np.cos(phi2)
+    x = np.cos(phi1) * np.sin(phi2) - np.sin(phi1) * np.cos(phi2) * np.cos(delta)
+    return np.degrees(np.arctan2(y, x)) % 360
+
+def unit_vector(latitude, longitude):
+    """(x, y, z) of a point given in degrees on the unit sphere"""
+    phi, lam = radians(latitude), radians(longitude)
+    return cos(phi) * cos(lam), cos(phi) * sin(lam), sin(phi)
+
+def chord_to_km(chord):
+    """great-circle km for a straight-line distance between two points of the unit sphere"""
+    return 2 * EARTH_RADIUS_KM * asin(min(1.0, chord / 2))
+
+def km_to_chord(km):
+    """straight-line distance on the unit sphere between two points km apart on the earth"""
+    return 2 * sin(min(km / EARTH_RADIUS_KM, 3.141592653589793) / 2)
@@ -0,0 +1,339 @@
+# encoding: utf-8
+'''
+Bulk harvesting of FlightStats schedules: one hub against many airports and dates.
+
+The (airport, date) queries run concurrently on a thread pool. Set
+schedules.RATE_LIMITER to keep them within the API quota - the workers then simply
+wait for tokens. Flights are appended to a columnar ScheduleStore as the replies come in.
+
+    store = Harvester("FRA").run([datetime.date(2016, 10, 25)], ["JFK", "LHR", "NRT"])
+    df = store.to_dataframe()
+
+    python -m flightstats.harvest FRA 2016-10-25 2016-10-31 --rate 5 --output fra.json
+
+Most airports have no flight to or from a given hub. With a RoutePrefilter only the airports
+with a route in data/routes.csv are queried. A random sample of the skipped queries is
+still made (audit_rate) to estimate how many flights the prefilter misses:
+
+    harvester = Harvester("FRA", prefilter=RoutePrefilter(audit_rate=0.02))
+    harvester.run(dates, airports)
+    harvester.stats["skipped"], harvester.estimated_misses()
+
+With a flightstats.journal.Journal every answered query is committed to disk as it comes in,
+and a rerun with the same journal only makes the queries that are still missing. The
+prefilter's decisions are journaled too, with its settings, so a rerun with the same prefilter
+skips and audits the same queries (without a prefilter, or with another one, they are decided again):
+
+    python -m flightstats.harvest FRA 2016-10-25 2016-10-31 --journal fra.journal
+
+'''
+from __future__ import unicode_literals, division, print_function, absolute_import
+
+import io
+import json
+import random
+import argparse
+import datetime
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from flightstats import datasets, schedules
+from flightstats.http_client import CLIENT
+
+DEFAULT_MAX_WORKERS = 16
+
+# the columns of a ScheduleStore: the query, then the scalar fields of FlightStats' scheduledFlights entries
+COLUMNS = ("hub", "airport", "date", "carrierFsCode", "flightNumber", "departureAirportFsCode",
+           "arrivalAirportFsCode", "departureTime", "arrivalTime", "stops", "departureTerminal", "arrivalTerminal",
+           "flightEquipmentIataCode", "isCodeshare", "isWetlease", "serviceType")
+
+
+class ScheduleStore(object):
+    """Harvested flights, one list per column"""
+
+    def __init__(self, columns=COLUMNS):
+        self.columns = OrderedDict((name, []) for name in columns)
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def append(self, hub, airport, date, flights):
+        """add the scheduledFlights of one query"""
+        query = dict(hub=hub, airport=airport, date=date.isoformat())
+        for name, values in self.columns.items():
+            if name in query:
+                values.extend([query[name]] * len(flights))
+            else:
+                values.extend(flight.get(name) for flight in flights)
+
+    def rows(self):
+        """the flights as tuples in column order"""
+        return zip(*self.columns.values())
+
+    def to_dataframe(self):
+        import pandas as pd
+        return pd.DataFrame(self.columns, columns=list(self.columns))
+
+    def write_json(self, path):
+        """write {column: [values]} (pandas.read_json reads it back)"""
+        with io.open(path, "wb") as json_file:
+            json_file.write(json.dumps(self.columns).encode("ascii"))
+
+
+class RoutePrefilter(object):
+    """Keep the airports that have a route to/from the hub in a RouteGraph
+
+    graph              - RouteGraph, by default the one of data/routes.csv
+    include_codeshares - count routes that are only flown as codeshares
+    audit_rate         - fraction of the skipped queries to make anyway, to estimate the flights missed
+    seed               - of the audit sample
+    """
+
+    def __init__(self, graph=None, include_codeshares=False, audit_rate=0.0, seed=None):
+        if graph is None:
+            from flightstats.routes import RouteGraph
+            graph = RouteGraph.from_csv()
+        self.graph = graph
+        self.include_codeshares = include_codeshares
+        self.audit_rate = audit_rate
+        self.random = random.Random(seed)
+
+    def connected(self, hub, inbound=False):
+        """the airports with a route from hub (to hub if inbound)"""
+        neighbors = self.graph.origins if inbound else self.graph.destinations
+        return set(neighbors(hub, include_codeshares=self.include_codeshares))
+
+    def audit(self, units):
+        """the sample of skipped units to query anyway"""
+        return [unit for unit in units if self.random.random() < self.audit_rate]
+
+    @property
+    def settings(self):
+        """what the decisions depend on, journaled with them"""
+        return "routes {} codeshares {} audit_rate {!r}".format(self.graph.number_of_routes, self.include_codeshares,
+                                                               self.audit_rate)
+
+
+class Harvester(object):
+    """Schedules of one hub against many airports
+
+    hub         - IATA code
+    direction   - "arriving" or "departing": whether the dates are arrival or departure dates
+    inbound     - flights airport -> hub instead of hub -> airport
+    max_workers - max concurrent requests
+    prefilter   - RoutePrefilter, to query only airports with a known route
+    journal     - flightstats.journal.Journal: every answered query is recorded there, and the queries
+                  recorded by an earlier run are replayed from it instead of being made again
+    """
+
+    def __init__(self, hub, direction="arriving", inbound=False, max_workers=DEFAULT_MAX_WORKERS, prefilter=None,
+                 journal=None):
+        if direction not in ("arriving", "departing"):
+            raise ValueError("direction must be 'arriving' or 'departing', not {!r}".format(direction))
+        self.hub = hub
+        self.direction = direction
+        self.inbound = inbound
+        self.max_workers = max_workers
+        self.prefilter = prefilter
+        self.journal = journal
+        # calls, empty, failed, flights; with a prefilter also skipped, audited, audit_failed, audit_flights;
+        # with a journal also resumed (queries replayed from it)
+        self.stats = Counter()
+        self.failures = []  # (airport, date, exception or None) of the queries that got no answer
+
+    @property
+    def job(self):
+        """the name of this harvest in the journal"""
+        return "schedules {} {} {}".format(self.direction, "to" if self.inbound else "from", self.hub)
+
+    @property
+    def prefilter_settings(self):
+        """RoutePrefilter.settings, None without a prefilter"""
+        return self.prefilter.settings if self.prefilter is not None else None
+
+    def _decided(self, result):
+        """whether a journaled result is a decision of a prefilter with the current settings"""
+        settings = self.prefilter_settings
+        return settings is not None and result.get("prefilter") == settings
+
+    def units(self, dates, airports, done=None):
+        """
+        the (airport, date, audit) queries to make - audits are the sampled ones the prefilter skipped.
+        done - {unit_key(): journaled result} of an earlier run: answered queries are left out, and the
+               decisions of a prefilter with the current settings are kept (skipped ones stay skipped, audits
+               not answered yet are made); other journaled decisions are made again
+        """
+        done = done or {}
+        units, decided = [], []
+        for date in dates:
+            for airport in airports:
+                if airport and airport != self.hub:
+                    result = done.get(unit_key(airport, date))
+                    if result is None or ("flights" not in result and not self._decided(result)):
+                        units.append((airport, date))
+                    elif "flights" not in result and result.get("audit"):
+                        decided.append((airport, date, True))
+        if self.prefilter is None:
+            return decided + [(airport, date, False) for airport, date in units]
+        connected = self.prefilter.connected(self.hub, self.inbound)
+        skipped = [unit for unit in units if unit[0] not in connected]
+        audits = self.prefilter.audit(skipped)
+        self.stats["skipped"] += len(skipped) - len(audits)
+        if self.journal is not None:
+            settings = self.prefilter_settings
+            decisions = {unit_key(airport, date): dict(skipped=True, prefilter=settings) for airport, date in skipped}
+            decisions.update((unit_key(airport, date), dict(audit=True, prefilter=settings))
+                             for airport, date in audits)
+            self.journal.record_many(self.job, decisions)
+        return decided + [(airport, date, False) for airport, date in units if airport in connected] + \
+            [(airport, date, True) for airport, date in audits]
+
+    def estimated_misses(self):
+        """flights in the queries the prefilter skipped, extrapolated from the audits (None without audits)"""
+        audited = self.stats["audited"] - self.stats["audit_failed"]
+        if not audited:
+            return None
+        return self.stats["audit_flights"] / audited * self.stats["skipped"]
+
+    def fetch(self, airport, date):
+        """the schedules reply for one query, None if it failed"""
+        origin, destination = (airport, self.hub) if self.inbound else (self.hub, airport)
+        query = schedules.arrivals if self.direction == "arriving" else schedules.departures
+        return query(origin, destination, date)
+
+    def run(self, dates, airports, store=None):
+        """fetch all (airport, date) pairs and return the store the flights were appended to"""
+        store = store if store is not None else ScheduleStore()
+        done = self._resume(store, dates, airports) if self.journal is not None else {}
+        CLIENT.grow(self.max_workers)  # without closing the session other callers are using
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.fetch, airport, date): (airport, date, audit)
+                       for airport, date, audit in self.units(dates, airports, done)}
+            try:
+                for future in as_completed(futures):
+                    airport, date, audit = futures[future]
+                    self._collect(store, airport, date, audit, future)
+            except BaseException:  # e.g. KeyboardInterrupt - don't wait for the queries not started yet
+                for future in futures:
+                    future.cancel()
+                raise
+        return store
+
+    def _resume(self, store, dates, airports):
+        """
+        replay the queries the journal has for these dates and airports, return the journal's results.
+        Skips and audits only count as such when they were decided by a prefilter with the current settings.
+        """
+        done = self.journal.results(self.job)
+        for date in dates:
+            for airport in airports:
+                result = done.get(unit_key(airport, date))
+                if result is None:
+                    continue
+                if "flights" in result:
+                    audit = result["audit"] and self._decided(result)
+                    self.stats["resumed"] += 1
+                    if audit:
+                        self.stats["audited"] += 1
+                    self._add(store, airport, date, audit, result["flights"])
+                elif result.get("skipped") and self._decided(result):
+                    self.stats["skipped"] += 1
+        return done
+
+    def _collect(self, store, airport, date, audit, future):
+        self.stats["calls"] += 1
+        if audit:
+            self.stats["audited"] += 1
+        try:
+            result = future.result()
+        except Exception as error:  # CircuitOpenError, RateLimitExceeded, connection errors after the retries
+            result = error
+        if result is None or isinstance(result, Exception):
+            self.stats["failed"] += 1
+            if audit:
+                self.stats["audit_failed"] += 1
+            self.failures.append((airport, date, result))
+            return
+        flights = result.get("scheduledFlights") or []
+        if self.journal is not None:
+            self.journal.record(self.job, unit_key(airport, date),
+                                dict(flights=flights, audit=audit, prefilter=self.prefilter_settings))
+        self._add(store, airport, date, audit, flights)
+
+    def _add(self, store, airport, date, audit, flights):
+        store.append(self.hub, airport, date, flights)
+        self.stats["flights"] += len(flights)
+        if audit:
+            self.stats["audit_flights"] += len(flights)
+        if not flights:
+            self.stats["empty"] += 1
+
+
+def unit_key(airport, date):
+    """the journal key of one query"""
+    return "{} {}".format(airport, date.isoformat())
+
+def date_range(first, last):
+    """the dates from first to last, inclusive"""
+    return [first + datetime.timedelta(days=days) for days in range((last - first).days + 1)]
+
+def default_airports():
+    """every IATA code in data/airports.csv"""
+    return [code for code in datasets.airports().categories("code_iata") if code]
+
+def _date(text):
+    return datetime.datetime.strptime(text, "%Y-%m-%d").date()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Harvest FlightStats schedules of a hub")
+    parser.add_argument("hub", help="IATA code of the hub")
+    parser.add_argument("first_date", type=_date, help="YYYY-MM-DD")
+    parser.add_argument("last_date", type=_date, nargs="?", help="YYYY-MM-DD, default first_date")
+    parser.add_argument("--airports", help="comma separated IATA codes, default every airport in data/airports.csv")
+    parser.add_argument("--airports-file", help="file with one IATA code per line")
+    parser.add_argument("--direction", choices=("arriving", "departing"), default="arriving")
+    parser.add_argument("--inbound", action="store_true", help="flights to the hub instead of from it")
+    parser.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS)
+    parser.add_argument("--rate", type=float, help="max calls per second")
+    parser.add_argument("--routes-prefilter", action="store_true",
+                        help="only query airports with a route to/from the hub in data/routes.csv")
+    parser.add_argument("--codeshares", action="store_true", help="let codeshare routes pass the prefilter")
+    parser.add_argument("--audit-rate", type=float, default=0.0,
+                        help="fraction of the prefiltered queries to make anyway, to estimate the flights missed")
+    parser.add_argument("--journal", help="SQLite file recording the answered queries - rerun with it to resume")
+    parser.add_argument("--output", help="write the flights here as {column: [values]} json")
+    args = parser.parse_args(argv)
+
+    if args.airports:
+        airports = [code.strip() for code in args.airports.split(",")]
+    elif args.airports_file:
+        with io.open(args.airports_file, encoding="utf-8") as airports_file:
+            airports = [line.strip() for line in airports_file if line.strip()]
+    else:
+        airports = default_airports()
+    if args.rate:
+        from flightstats.ratelimit import RateLimiter, TokenBucket
+        schedules.RATE_LIMITER = RateLimiter(TokenBucket(args.rate))
+
+    prefilter = RoutePrefilter(include_codeshares=args.codeshares, audit_rate=args.audit_rate) \
+        if args.routes_prefilter else None
+    journal = None
+    if args.journal:
+        from flightstats.journal import Journal
+        journal = Journal(args.journal)
+    harvester = Harvester(args.hub, args.direction, args.inbound, args.workers, prefilter, journal)
+    store = harvester.run(date_range(args.first_date, args.last_date or args.first_date), airports)
+    print(", ".join("{} {}".format(name, harvester.stats[name])
+                    for name in ("calls", "resumed", "empty", "failed", "flights")))
+    if prefilter is not None:
+        misses = harvester.estimated_misses()
+        print("skipped {}, audited {} (found {} flights), estimated flights missed: {}".format(
+            harvester.stats["skipped"], harvester.stats["audited"], harvester.stats["audit_flights"],
+            "{:.0f}".format(misses) if misses is not None else "unknown"))
+    if args.output:
+        store.write_json(args.output)
+        print("wrote", args.output)
+
+
+if __name__ == '__main__':
+    main()
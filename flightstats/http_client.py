@@ -0,0 +1,100 @@
+# encoding: utf-8
+'''
+Pooled HTTP client shared by the FlightAware and FlightStats wrappers.
+
+A bare requests.get() opens (and throws away) a new connection on every call.
+One requests.Session per process keeps connections alive between calls, so we only
+pay the TCP/TLS handshake once per pooled connection.
+
+'''
+from __future__ import unicode_literals, division, print_function, absolute_import
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_POOL_CONNECTIONS = 10  # number of hosts we keep a connection pool for
+DEFAULT_POOL_MAXSIZE = 10  # connections kept alive per host
+DEFAULT_TIMEOUT = 10
+
+
+class PooledClient(object):
+    """A lazily built requests.Session with a tuned connection pool
+
+    pool_connections - number of per-host pools to cache
+    pool_maxsize     - max connections kept alive per host
+    pool_block       - when True, callers wait for a free connection instead of opening
+                       extra throw-away connections once pool_maxsize is reached,
+                       which turns pool_maxsize into a hard per-host connection limit
+    """
+
+    def __init__(self, pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 pool_block=False, timeout=DEFAULT_TIMEOUT):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.timeout = timeout
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        """the shared session, built on first use"""
+        session = self._session
+        if session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._build_session()
+                session = self._session
+        return session
+
+    def _build_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                              pool_maxsize=self.pool_maxsize,
+                              pool_block=self.pool_block)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers['Connection'] = 'keep-alive'
+        return session
+
+    def configure(self, pool_connections=None, pool_maxsize=None, pool_block=None, timeout=None):
+        """Change pool settings. The current session is closed and rebuilt on next use."""
+        if pool_connections is not None:
+            self.pool_connections = pool_connections
+        if pool_maxsize is not None:
+            self.pool_maxsize = pool_maxsize
+        if pool_block is not None:
+            self.pool_block = pool_block
+        if timeout is not None:
+            self.timeout = timeout
+        self.close()
+
+    def grow(self, pool_maxsize):
+        """
+        Keep at least pool_maxsize connections alive per host, without disturbing calls in flight: a bigger
+        session is swapped in and the current one is left to the calls still using it (its connections close
+        when it is garbage collected).
+        """
+        with self._lock:
+            if pool_maxsize <= self.pool_maxsize:
+                return
+            self.pool_maxsize = pool_maxsize
+            if self._session is not None:
+                self._session = self._build_session()
+
+    def get(self, url, **kwargs):
+        """GET through the pooled session"""
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.get(url, **kwargs)
+
+    def close(self):
+        """close all pooled connections"""
+        with self._lock:
+            session, self._session = self._session, None
+        if session is not None:
+            session.close()
+
+
+CLIENT = PooledClient()
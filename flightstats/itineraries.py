@@ -0,0 +1,103 @@
+# encoding: utf-8
+'''
+Multi-leg connections over the route network, shortest great-circle distance first.
+
+    finder = ItineraryFinder()
+    finder.find("FRA", "SYD", max_legs=2, k=5)   # [Itinerary(airports=('FRA', 'SIN', 'SYD'), km=16479.1), ...]
+
+The search is A* over simple paths: partial routings are expanded in order of distance
+flown plus the great-circle distance still to go, so complete routings come off the heap
+in increasing total distance and the search stops after the k-th. Before searching, a
+breadth-first pass backwards from the destination finds how many legs every airport is
+from it, which prunes every branch that cannot arrive within max_legs.
+
+'''
+from __future__ import unicode_literals, division, print_function, absolute_import
+
+import heapq
+from collections import namedtuple
+
+from flightstats.geo import haversine_km
+from flightstats.routes import RouteGraph
+
+Itinerary = namedtuple("Itinerary", ["airports", "km"])
+
+
+class ItineraryFinder(object):
+    """Connection search over a RouteGraph
+
+    graph       - RouteGraph, by default the one of data/routes.csv
+    coordinates - code -> (latitude, longitude), by default from data/airports.csv and then FA_AIRPORTS.
+                  Airports without coordinates are never part of a routing.
+    """
+
+    def __init__(self, graph=None, coordinates=None):
+        self.graph = graph if graph is not None else RouteGraph.from_csv()
+        if coordinates is None:
+            self.coordinates = self.graph.coordinates()  # airport id -> (lat, lon) or None
+        else:
+            self.coordinates = [coordinates.get(code) for code in self.graph.codes]
+        self._neighbors = {}  # (airport id, airline, include_codeshares) -> destination ids
+
+    def neighbors(self, airport_id, airline=None, include_codeshares=True):
+        key = airport_id, airline, include_codeshares
+        neighbors = self._neighbors.get(key)
+        if neighbors is None:
+            coordinates = self.coordinates
+            neighbors = self._neighbors[key] = [
+                target for target in self.graph.destination_ids(airport_id, airline, include_codeshares)
+                if coordinates[target] is not None]
+        return neighbors
+
+    def legs_to(self, destination_id, max_legs, airline=None, include_codeshares=True):
+        """airport id -> fewest legs to destination_id, for airports at most max_legs away"""
+        legs = {destination_id: 0}
+        layer = [destination_id]
+        for depth in range(1, max_legs + 1):
+            next_layer = []
+            for airport_id in layer:
+                for source in self.graph.origin_ids(airport_id, airline, include_codeshares):
+                    if source not in legs and self.coordinates[source] is not None:
+                        legs[source] = depth
+                        next_layer.append(source)
+            layer = next_layer
+        return legs
+
+    def distance(self, airport_id1, airport_id2):
+        (latitude1, longitude1), (latitude2, longitude2) = self.coordinates[airport_id1], self.coordinates[airport_id2]
+        return haversine_km(latitude1, longitude1, latitude2, longitude2)
+
+    def find(self, origin, destination, max_legs=2, k=10, airline=None, include_codeshares=True):
+        """
+        Routings origin -> destination with at most max_legs flights, as Itinerary(airports, km) sorted by
+        great-circle distance. k=None returns all of them. airline restricts every leg to one airline.
+        """
+        graph = self.graph
+        origin_id, destination_id = graph.airport_ids.get(origin), graph.airport_ids.get(destination)
+        if origin_id is None or destination_id is None or origin_id == destination_id \
+                or self.coordinates[origin_id] is None or self.coordinates[destination_id] is None:
+            return []
+        legs_to = self.legs_to(destination_id, max_legs - 1, airline, include_codeshares)
+        remaining = {}  # airport id -> great-circle km to the destination (the A* heuristic)
+
+        def estimate(airport_id):
+            km = remaining.get(airport_id)
+            if km is None:
+                km = remaining[airport_id] = self.distance(airport_id, destination_id)
+            return km
+
+        found = []
+        heap = [(estimate(origin_id), 0.0, (origin_id,))]
+        while heap and (k is None or len(found) < k):
+            _, flown, path = heapq.heappop(heap)
+            airport_id = path[-1]
+            if airport_id == destination_id:
+                found.append(Itinerary(tuple(graph.codes[step] for step in path), flown))
+                continue
+            legs_left = max_legs - len(path)  # after the next leg
+            for target in self.neighbors(airport_id, airline, include_codeshares):
+                if legs_to.get(target, max_legs) > legs_left or target in path:
+                    continue
+                km = flown + self.distance(airport_id, target)
+                heapq.heappush(heap, (km + estimate(target), km, path + (target,)))
+        return found
@@ -0,0 +1,80 @@
+# encoding: utf-8
+'''
+Durable progress of bulk pulls.
+
+A Journal records every finished unit of work (one schedules query, one page of a
+FlightXML2 pull) with its result in a SQLite file, committed as soon as the unit is done.
+Re-running a pull with the same journal replays the recorded units instead of calling the
+API again, so a crashed or interrupted harvest picks up where it stopped:
+
+    journal = Journal("fra-october.journal")
+    Harvester("FRA", journal=journal).run(dates, airports)
+    for flight in flightaware.iter_airline_flight_schedules(start, end, origin="FRA", journal=journal): ...
+
+'''
+from __future__ import unicode_literals, division, print_function, absolute_import
+
+import json
+import time
+import sqlite3
+import threading
+
+
+class Journal(object):
+    """Finished units and their (json-able) results, by job and key
+
+    job - names one bulk pull, e.g. the command and its parameters
+    key - names one unit of the job
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS units ("
+                           "job TEXT, key TEXT, result TEXT, finished_at REAL, PRIMARY KEY (job, key))")
+
+    def record(self, job, key, result):
+        """mark a unit finished - durable when this returns"""
+        value = json.dumps(result, sort_keys=True)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO units VALUES (?, ?, ?, ?)", (job, key, value, time.time()))
+
+    def record_many(self, job, results):
+        """mark the units of {key: result} finished, in one transaction"""
+        now = time.time()
+        rows = [(job, key, json.dumps(result, sort_keys=True), now) for key, result in results.items()]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany("INSERT OR REPLACE INTO units VALUES (?, ?, ?, ?)", rows)
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def get(self, job, key):
+        """the result of a finished unit, None if it isn't finished"""
+        with self._lock:
+            row = self._conn.execute("SELECT result FROM units WHERE job = ? AND key = ?", (job, key)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def results(self, job):
+        """{key: result} of the finished units of a job"""
+        with self._lock:
+            rows = self._conn.execute("SELECT key, result FROM units WHERE job = ?", (job,)).fetchall()
+        return {key: json.loads(result) for key, result in rows}
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM units").fetchone()[0]
+
+    def forget(self, job):
+        """drop the units of a job, so that it runs from scratch"""
+        with self._lock:
+            self._conn.execute("DELETE FROM units WHERE job = ?", (job,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,600 @@
+# encoding: utf-8
+'''
+Local stand-in for the FlightXML2 and FlightStats schedules APIs, for benchmarks, load tests
+and offline work.
+
+Flights are synthetic but stable: every route of data/routes.csv gets flights_per_route
+daily flights whose numbers and local departure minutes are derived from the route, and
+whose durations follow the great-circle distance. Airports, their ICAO codes and time zones
+come from data/airports.csv, airline ICAO codes and names from data/airlines.csv.
+
+    server = serve(MockUpstream(latency=0.05, error_rate=0.01))
+    flightaware.URL = server.flightxml_url
+    schedules.URL = server.schedules_url
+    ...
+    server.shutdown()
+
+    python -m flightstats.mock_server --port 8080 --latency 50 --error-rate 0.01
+
+Served FlightXML2 commands (json/FlightXML2/<command>): AirportInfo, AirlineInfo, FlightInfoEx,
+AirlineFlightInfo, InFlightInfo, Search, Scheduled, AirlineFlightSchedules and
+SetMaximumResultSize. Paginated commands honour howMany and offset, answer next_offset and
+refuse pages bigger than the maximum result size, like the real API. The schedules API is
+served under flex/schedules/rest/v1/json/from/<A>/to/<B>/arriving|departing/<y>/<m>/<d>.
+Credentials are not checked. A fraction error_rate of the requests gets a 503.
+
+'''
+from __future__ import unicode_literals, division, print_function, absolute_import
+
+import json
+import time
+import zlib
+import random
+import argparse
+import calendar
+import datetime
+import threading
+from collections import namedtuple, defaultdict
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qsl
+except ImportError:  # python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse, parse_qsl
+
+from flightstats import datasets
+from flightstats.routes import RouteGraph
+
+FLIGHTXML_PATH = "json/FlightXML2/"
+SCHEDULES_PATH = "flex/schedules/rest/v1/json/"
+DEFAULT_MAX_RESULT_SIZE = 15
+CRUISE_KMH = 800
+TAXI_SECONDS = 30 * 60
+MAX_CACHED_DAYS = 4096  # daily schedules kept by SyntheticFlights
+
+# one daily flight of a route; minute is the local departure time at the origin
+# operator is the Slot of the operated flight when this one is a codeshare
+Slot = namedtuple("Slot", ["index", "ident", "carrier", "number", "origin", "destination", "minute", "duration",
+                           "operator", "equipment"])
+Airport = namedtuple("Airport", ["iata", "icao", "name", "city", "country", "latitude", "longitude", "tz_hours",
+                                 "tz_region"])
+
+
+def _hash(*parts):
+    return zlib.crc32("/".join("{}".format(part) for part in parts).encode("utf-8")) & 0xffffffff
+
+def _day_start(date):
+    return calendar.timegm(date.timetuple())
+
+def _date(epoch):
+    return datetime.datetime.utcfromtimestamp(epoch).date()
+
+def _iso(epoch):
+    return datetime.datetime.utcfromtimestamp(epoch).strftime("%Y-%m-%dT%H:%M:%S.000")
+
+def _timezone(name):
+    """pytz timezone of an Olson name, None when unknown or pytz is missing"""
+    try:
+        import pytz
+        return pytz.timezone(name)
+    except Exception:  # pylint:disable=broad-except  # ImportError, UnknownTimeZoneError
+        return None
+
+def _departure_order(flight):
+    return flight[1], flight[0].index
+
+def _number(value, default):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class SyntheticFlights(object):
+    """Deterministic daily flights on every route of a RouteGraph
+
+    graph             - RouteGraph, by default the one of data/routes.csv
+    flights_per_route - daily flights of every route (codeshare routes get the same number of marketing flights)
+    """
+
+    def __init__(self, graph=None, flights_per_route=1):
+        self.graph = graph if graph is not None else RouteGraph.from_csv()
+        self.airports = self._airports()
+        self.airlines = self._airlines()
+        self.by_icao = {airport.icao: airport for airport in self.airports.values() if airport.icao}
+        self._offsets = {}
+        self._days = {}  # (slots key, date) -> sorted (slot, departure) of that day
+        self.slots = []
+        self.by_ident = defaultdict(list)
+        self.by_origin = defaultdict(list)
+        self.by_destination = defaultdict(list)
+        self.by_route = defaultdict(list)
+        self._build(flights_per_route)
+
+    @staticmethod
+    def _airports():
+        table = datasets.airports()
+        columns = zip(table.strings("code_iata"), table.strings("code_icao"), table.strings("name"),
+                      table.strings("city"), table.strings("country"), table["latitude"].tolist(),
+                      table["longitude"].tolist(), table["tz"].tolist(), table.strings("tz_region"))
+        airports = {}
+        for iata, icao, name, city, country, latitude, longitude, tz_hours, tz_region in columns:
+            if iata and iata not in airports:
+                airports[iata] = Airport(iata, icao, name, city, country, latitude, longitude,
+                                         tz_hours if tz_hours == tz_hours else 0.0, tz_region)
+        return airports
+
+    @staticmethod
+    def _airlines():
+        """IATA code -> (ICAO code, name) of the airlines with both codes"""
+        table = datasets.airlines()
+        airlines = {}
+        for iata, icao, name in zip(table.strings("iata"), table.strings("icao"), table.strings("name")):
+            if len(iata) == 2 and len(icao) == 3 and icao.isalpha() and icao.isupper():
+                airlines.setdefault(iata, (icao, name))
+        return airlines
+
+    def airline_icao(self, code):
+        return self.airlines.get(code, (code, None))[0]
+
+    def _build(self, flights_per_route):
+        graph = self.graph
+        distances = graph.distances()
+        operated = {}  # (origin, destination) -> Slot of the first operated flight, the operator of codeshares
+        edges = sorted(range(graph.number_of_routes), key=lambda edge: graph.codeshares[edge])  # operated routes first
+        for edge in edges:
+            origin, destination = graph.codes[graph.sources[edge]], graph.codes[graph.targets[edge]]
+            if origin not in self.airports or destination not in self.airports:
+                continue
+            carrier = graph.airlines[graph.edge_airlines[edge]]
+            km = distances[edge]
+            duration = int((km if km == km else 500) / CRUISE_KMH * 3600) // 60 * 60 + TAXI_SECONDS
+            equipment = (graph.equipment[edge] or "").split(" ")[0]
+            operator = operated.get((origin, destination)) if graph.codeshares[edge] else None
+            for frequency in range(flights_per_route):
+                route_hash = _hash(carrier, origin, destination, frequency)
+                number = 1 + route_hash % 9999
+                minute = operator.minute if operator else route_hash // 10000 % 288 * 5  # codeshares fly with it
+                slot = Slot(len(self.slots), "{}{}".format(self.airline_icao(carrier), number), carrier, number,
+                            origin, destination, minute, duration, operator, equipment)
+                self.slots.append(slot)
+                self.by_ident[slot.ident].append(slot)
+                self.by_origin[origin].append(slot)
+                self.by_destination[destination].append(slot)
+                self.by_route[origin, destination].append(slot)
+                if not graph.codeshares[edge]:
+                    operated.setdefault((origin, destination), slot)
+
+    def airport(self, code):
+        """Airport of an IATA or ICAO code, None if unknown"""
+        return self.airports.get(code) or self.by_icao.get(code)
+
+    def icao(self, iata):
+        airport = self.airports.get(iata)
+        return airport.icao or iata if airport else iata
+
+    def utc_offset(self, iata, date):
+        """seconds the local time of an airport is ahead of UTC on date"""
+        key = iata, date
+        offset = self._offsets.get(key)
+        if offset is None:
+            airport = self.airports[iata]
+            tz = _timezone(airport.tz_region) if airport.tz_region else None
+            if tz is not None:
+                offset = int(tz.utcoffset(datetime.datetime(date.year, date.month, date.day, 12)).total_seconds())
+            else:
+                offset = int(airport.tz_hours * 3600)
+            self._offsets[key] = offset
+        return offset
+
+    def departure(self, slot, date):
+        """epoch seconds of the departure of slot on the local date at its origin"""
+        return _day_start(date) + slot.minute * 60 - self.utc_offset(slot.origin, date)
+
+    def flights(self, slots, first_date, last_date, key=None):
+        """
+        (slot, departure epoch) of slots departing on the local dates first_date to last_date, by departure.
+        key - names the slots (e.g. ("origin", "FRA")) to cache their daily schedules under
+        """
+        flights = []
+        for days in range((last_date - first_date).days + 1):
+            flights.extend(self._day(slots, first_date + datetime.timedelta(days=days), key))
+        flights.sort(key=_departure_order)  # the days are sorted runs, so this is mostly merging
+        return flights
+
+    def _day(self, slots, date, key):
+        day = self._days.get((key, date)) if key is not None else None
+        if day is None:
+            day = sorted(((slot, self.departure(slot, date)) for slot in slots), key=_departure_order)
+            if key is not None:
+                if len(self._days) >= MAX_CACHED_DAYS:
+                    self._days.clear()
+                self._days[key, date] = day
+        return day
+
+    def flights_between(self, slots, start, end, key=None):
+        """(slot, departure epoch) of slots departing between the epochs start (inclusive) and end"""
+        first, last = _date(start) - datetime.timedelta(days=1), _date(end) + datetime.timedelta(days=1)
+        return [(slot, departure) for slot, departure in self.flights(slots, first, last, key)
+                if start <= departure < end]
+
+    @staticmethod
+    def fa_flight_id(slot, departure):
+        return "{}-{}-schedule-{:04d}".format(slot.ident, departure, slot.index)
+
+    def parse_fa_flight_id(self, fa_flight_id):
+        """(slot, departure) of a faFlightID made by fa_flight_id(), None if it isn't one"""
+        parts = fa_flight_id.split("-")
+        if len(parts) != 4 or parts[2] != "schedule":
+            return None
+        index, departure = _number(parts[3], -1), _number(parts[1], None)
+        if not 0 <= index < len(self.slots) or departure is None or self.slots[index].ident != parts[0]:
+            return None
+        return self.slots[index], departure
+
+
+class MockUpstream(object):
+    """handler(path, query) -> (status, payload) of the mock APIs, for serve()
+
+    flights         - SyntheticFlights, made on first use when None
+    latency         - seconds every request waits before it is answered
+    error_rate      - fraction of the requests answered with a 503
+    max_result_size - initial howMany limit of the paginated commands (SetMaximumResultSize changes it)
+    seed            - of the errors
+    now             - epoch seconds the mock pretends it is (Search, InFlightInfo, Scheduled), default the clock
+    """
+
+    def __init__(self, flights=None, latency=0.0, error_rate=0.0, max_result_size=DEFAULT_MAX_RESULT_SIZE, seed=None,
+                 now=None, flights_per_route=1):
+        self._flights = flights
+        self._flights_per_route = flights_per_route
+        self._flights_lock = threading.Lock()
+        self.latency = latency
+        self.error_rate = error_rate
+        self.max_result_size = max_result_size
+        self.random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._now = now
+        self.commands = {"AirportInfo": self.airport_info, "AirlineInfo": self.airline_info,
+                         "FlightInfoEx": self.flight_info_ex, "AirlineFlightInfo": self.airline_flight_info,
+                         "InFlightInfo": self.in_flight_info, "Search": self.search, "Scheduled": self.scheduled,
+                         "AirlineFlightSchedules": self.airline_flight_schedules,
+                         "SetMaximumResultSize": self.set_maximum_result_size}
+
+    @property
+    def flights(self):
+        if self._flights is None:
+            with self._flights_lock:
+                if self._flights is None:
+                    self._flights = SyntheticFlights(flights_per_route=self._flights_per_route)
+        return self._flights
+
+    def now(self):
+        return int(self._now if self._now is not None else time.time())
+
+    def __call__(self, path, query):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_rate:
+            with self._random_lock:
+                failing = self.random.random() < self.error_rate
+            if failing:
+                return 503, {"error": "Service Unavailable"}
+        path = path.lstrip("/")
+        if path.startswith(FLIGHTXML_PATH):
+            command = self.commands.get(path[len(FLIGHTXML_PATH):])
+            if command is None:
+                return 404, {"error": "unknown command"}
+            return 200, command(query)
+        if path.startswith(SCHEDULES_PATH):
+            return self.schedules(path[len(SCHEDULES_PATH):].split("/"))
+        return 404, {"error": "not found"}
+
+    # FlightXML2
+
+    def _page(self, query, rows, result_key, rows_key):
+        how_many, offset = _number(query.get("howMany"), DEFAULT_MAX_RESULT_SIZE), _number(query.get("offset"), 0)
+        if how_many > self.max_result_size:
+            return {"error": "howMany is larger than the maximum result size {}".format(self.max_result_size)}
+        end = offset + how_many
+        return {result_key: {rows_key: [render() for render in rows[offset:end]],
+                             "next_offset": end if end < len(rows) else -1}}
+
+    def set_maximum_result_size(self, query):
+        self.max_result_size = _number(query.get("max_size"), self.max_result_size)
+        return {"SetMaximumResultSizeResult": 0}
+
+    def airport_info(self, query):
+        airport = self.flights.airport(query.get("airportCode"))
+        if airport is None:
+            return {"error": "unknown airport {}".format(query.get("airportCode"))}
+        return {"AirportInfoResult": {"name": airport.name, "location": "{}, {}".format(airport.city, airport.country),
+                                      "latitude": airport.latitude, "longitude": airport.longitude,
+                                      "timezone": ":" + airport.tz_region if airport.tz_region else ""}}
+
+    def airline_info(self, query):
+        code = query.get("airlineCode")
+        name = next((name for icao, name in self.flights.airlines.values() if icao == code), None)
+        if name is None:
+            return {"error": "unknown airline {}".format(code)}
+        return {"AirlineInfoResult": {"name": name, "shortname": name, "callsign": "", "location": "", "country": "",
+                                      "url": "", "phone": ""}}
+
+    def _flight_info(self, slot, departure):
+        flights = self.flights
+        origin, destination = flights.airports[slot.origin], flights.airports[slot.destination]
+        now = self.now()
+        return {"faFlightID": flights.fa_flight_id(slot, departure), "ident": slot.ident,
+                "aircrafttype": slot.equipment,
+                "origin": origin.icao or origin.iata, "originName": origin.name, "originCity": origin.city,
+                "destination": destination.icao or destination.iata, "destinationName": destination.name,
+                "destinationCity": destination.city, "filed_departuretime": departure,
+                "estimatedarrivaltime": departure + slot.duration, "filed_time": departure - 86400,
+                "actualdeparturetime": departure if departure <= now else 0,
+                "actualarrivaltime": departure + slot.duration if departure + slot.duration <= now else 0,
+                "filed_ete": "{:02d}:{:02d}:00".format(slot.duration // 3600, slot.duration % 3600 // 60),
+                "filed_airspeed_kts": 430, "filed_airspeed_mach": "", "filed_altitude": 350, "diverted": "",
+                "route": ""}
+
+    def _dated_flights(self, ident):
+        """(slot, departure) of a flight number from two days ago to two days ahead"""
+        today = _date(self.now())
+        return self.flights.flights(self.flights.by_ident.get(ident, []), today - datetime.timedelta(days=2),
+                                    today + datetime.timedelta(days=2), key=("ident", ident))
+
+    def flight_info_ex(self, query):
+        ident = query.get("ident", "")
+        found = self.flights.parse_fa_flight_id(ident)
+        flights = [found] if found else self._dated_flights(ident)
+        if not flights:
+            return {"error": "unknown flight {}".format(ident)}
+        return self._page(query, [lambda flight=flight: self._flight_info(*flight) for flight in flights],
+                          "FlightInfoExResult", "flights")
+
+    def airline_flight_info(self, query):
+        found = self.flights.parse_fa_flight_id(query.get("faFlightID", ""))
+        if found is None:
+            return {"error": "unknown faFlightID"}
+        slot, departure = found
+        gates = _hash(slot.ident, departure)
+        return {"AirlineFlightInfoResult": {
+            "faFlightID": self.flights.fa_flight_id(slot, departure), "ident": slot.ident,
+            "gate_orig": "{}{}".format("ABCDE"[gates % 5], gates // 5 % 60 + 1),
+            "gate_dest": "{}{}".format("ABCDE"[gates // 300 % 5], gates // 1500 % 60 + 1),
+            "terminal_orig": "{}".format(gates // 90000 % 3 + 1), "terminal_dest": "{}".format(gates // 270000 % 3 + 1),
+            "bag_claim": "{}".format(gates // 810000 % 12 + 1), "codeshares": [], "meal_service": "",
+            "seats_cabin_first": 0, "seats_cabin_business": 12, "seats_cabin_coach": 150, "tailnumber": ""}}
+
+    def _position(self, slot, departure):
+        """InFlightInfo/Search fields of a flight, positioned on the great circle at now"""
+        flights = self.flights
+        origin, destination = flights.airports[slot.origin], flights.airports[slot.destination]
+        progress = min(max((self.now() - departure) / slot.duration, 0.0), 1.0)
+        return {"faFlightID": flights.fa_flight_id(slot, departure), "ident": slot.ident, "type": slot.equipment,
+                "origin": origin.icao or origin.iata, "destination": destination.icao or destination.iata,
+                "departureTime": departure, "arrivalTime": departure + slot.duration,
+                "firstPositionTime": departure, "timestamp": self.now(), "prefix": "", "suffix": "", "timeout": "ok",
+                "latitude": origin.latitude + (destination.latitude - origin.latitude) * progress,
+                "longitude": origin.longitude + (destination.longitude - origin.longitude) * progress,
+                "groundspeed": 450 if 0 < progress < 1 else 0, "altitude": 350 if 0 < progress < 1 else 0,
+                "heading": 0, "altitudeStatus": "", "updateType": "TP", "altitudeChange": "", "waypoints": ""}
+
+    def in_flight_info(self, query):
+        now = self.now()
+        upcoming = [(slot, departure) for slot, departure in self._dated_flights(query.get("ident", ""))
+                    if departure + slot.duration > now]
+        if not upcoming:
+            return {"error": "unknown flight {}".format(query.get("ident"))}
+        return {"InFlightInfoResult": self._position(*upcoming[0])}
+
+    def search(self, query):
+        """the flights in the air now, for queries with -origin and/or -destination"""
+        words = query.get("query", "").split()
+        terms = dict(zip(words[::2], words[1::2]))
+        origin, destination = (self.flights.airport(terms.get(term)) for term in ("-origin", "-destination"))
+        if origin is None and destination is None:
+            return {"error": "unsupported query {}".format(query.get("query"))}
+        if origin is not None:
+            slots = self.flights.by_origin.get(origin.iata, [])
+            if destination is not None:
+                slots = self.flights.by_route.get((origin.iata, destination.iata), [])
+        else:
+            slots = self.flights.by_destination.get(destination.iata, [])
+        key = ("search", origin and origin.iata, destination and destination.iata)
+        now = self.now()
+        airborne = [flight for flight in self.flights.flights_between(slots, now - 86400, now + 1, key)
+                    if flight[1] + flight[0].duration > now]
+        return self._page(query, [lambda flight=flight: self._position(*flight) for flight in airborne],
+                          "SearchResult", "aircraft")
+
+    def scheduled(self, query):
+        """flights departing from 2 hours ago to 24 hours ahead, soonest first"""
+        airport = self.flights.airport(query.get("airport"))
+        if airport is None:
+            return {"error": "unknown airport {}".format(query.get("airport"))}
+        if query.get("filter") == "ga":
+            return {"ScheduledResult": {"scheduled": [], "next_offset": -1}}
+        now = self.now()
+        flights = self.flights.flights_between(self.flights.by_origin.get(airport.iata, []), now - 7200, now + 86400,
+                                               key=("origin", airport.iata))
+        return self._page(query, [lambda flight=flight: self._scheduled_row(*flight) for flight in flights],
+                          "ScheduledResult", "scheduled")
+
+    def _scheduled_row(self, slot, departure):
+        row = self._flight_info(slot, departure)
+        return {key: row[key] for key in ("ident", "aircrafttype", "filed_departuretime", "estimatedarrivaltime",
+                                          "origin", "originName", "originCity", "destination", "destinationName",
+                                          "destinationCity")}
+
+    def airline_flight_schedules(self, query):
+        flights = self.flights
+        origin, destination = (flights.airport(query.get(name)) if query.get(name) else None
+                               for name in ("origin", "destination"))
+        if (query.get("origin") and origin is None) or (query.get("destination") and destination is None):
+            return {"AirlineFlightSchedulesResult": {"data": [], "next_offset": -1}}
+        airline, flight_number = query.get("airline"), _number(query.get("flightno"), None)
+        if origin is not None:
+            slots = flights.by_origin.get(origin.iata, [])
+        elif destination is not None:
+            slots = flights.by_destination.get(destination.iata, [])
+        else:
+            slots = flights.slots
+        slots = [slot for slot in slots
+                 if (destination is None or slot.destination == destination.iata)
+                 and (not airline or airline in (slot.carrier, flights.airline_icao(slot.carrier)))
+                 and (flight_number is None or slot.number == flight_number)]
+        start, end = _number(query.get("startDate"), 0), _number(query.get("endDate"), 0)
+        key = ("schedules", origin and origin.iata, destination and destination.iata, airline, flight_number)
+        rows = flights.flights_between(slots, start, end, key)
+        return self._page(query, [lambda flight=flight: self._schedule_row(*flight) for flight in rows],
+                          "AirlineFlightSchedulesResult", "data")
+
+    def _schedule_row(self, slot, departure):
+        flights = self.flights
+        return {"ident": slot.ident, "actual_ident": slot.operator.ident if slot.operator else "",
+                "departuretime": departure,
+                "arrivaltime": departure + slot.duration, "origin": flights.icao(slot.origin),
+                "destination": flights.icao(slot.destination), "aircrafttype": slot.equipment, "meal_service": "",
+                "seats_cabin_first": 0, "seats_cabin_business": 12, "seats_cabin_coach": 150}
+
+    # FlightStats schedules
+
+    def schedules(self, parts):
+        """from/<A>/to/<B>/arriving|departing/<year>/<month>/<day>"""
+        if len(parts) != 8 or parts[0] != "from" or parts[2] != "to" or parts[4] not in ("arriving", "departing"):
+            return 404, {"error": {"httpStatusCode": 404, "errorMessage": "not found"}}
+        try:
+            date = datetime.date(int(parts[5]), int(parts[6]), int(parts[7]))
+        except ValueError:
+            return 400, {"error": {"httpStatusCode": 400, "errorMessage": "invalid date"}}
+        flights = self.flights
+        slots, key = flights.by_route.get((parts[1], parts[3]), []), ("route", parts[1], parts[3])
+        if parts[4] == "departing":
+            rows = flights.flights(slots, date, date, key)
+        else:
+            rows = [(slot, departure) for slot, departure in
+                    flights.flights(slots, date - datetime.timedelta(days=2), date, key)
+                    if self._local_date(slot.destination, departure + slot.duration) == date]
+        return 200, {"request": {"departureAirport": {"requestedCode": parts[1]},
+                                 "arrivalAirport": {"requestedCode": parts[3]},
+                                 "date": {"year": parts[5], "month": parts[6], "day": parts[7]}},
+                     "scheduledFlights": [self._scheduled_flight(*row) for row in rows],
+                     "appendix": {"airlines": [], "airports": [], "equipments": []}}
+
+    def _local_date(self, iata, epoch):
+        date = _date(epoch)
+        return _date(epoch + self.flights.utc_offset(iata, date))
+
+    def _local_time(self, iata, epoch):
+        return _iso(epoch + self.flights.utc_offset(iata, _date(epoch)))
+
+    def _scheduled_flight(self, slot, departure):
+        gates = _hash(slot.ident, departure)
+        operator = slot.operator
+        flight = {"carrierFsCode": slot.carrier, "flightNumber": "{}".format(slot.number),
+                  "departureAirportFsCode": slot.origin, "arrivalAirportFsCode": slot.destination,
+                  "departureTime": self._local_time(slot.origin, departure),
+                  "arrivalTime": self._local_time(slot.destination, departure + slot.duration),
+                  "stops": 0, "departureTerminal": "{}".format(gates // 90000 % 3 + 1),
+                  "arrivalTerminal": "{}".format(gates // 270000 % 3 + 1), "flightEquipmentIataCode": slot.equipment,
+                  "isCodeshare": operator is not None, "isWetlease": False, "serviceType": "J",
+                  "serviceClasses": ["J", "Y"], "trafficRestrictions": [], "codeshares": [],
+                  "referenceCode": "{}".format(slot.index)}
+        if operator is not None:
+            flight["operator"] = {"carrierFsCode": operator.carrier, "flightNumber": "{}".format(operator.number),
+                                  "serviceType": "J", "serviceClasses": ["J", "Y"], "trafficRestrictions": []}
+        return flight
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    handler = None
+    requests = 0
+
+    def __init__(self, *args, **kwargs):
+        HTTPServer.__init__(self, *args, **kwargs)
+        self._requests_lock = threading.Lock()
+
+    def count_request(self):
+        """count a request, the handler threads run concurrently"""
+        with self._requests_lock:
+            self.requests += 1
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return "http://{}:{}/".format("127.0.0.1" if host in ("0.0.0.0", "") else host, port)
+
+    @property
+    def flightxml_url(self):
+        """for flightaware.URL"""
+        return self.url + FLIGHTXML_PATH
+
+    @property
+    def schedules_url(self):
+        """for schedules.URL"""
+        return self.url + SCHEDULES_PATH
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # allow keep-alive
+    disable_nagle_algorithm = True  # don't let small replies wait for delayed ACKs
+
+    def do_GET(self):  # pylint:disable=invalid-name
+        url = urlparse(self.path)
+        self.server.count_request()
+        status, payload = self.server.handler(url.path, dict(parse_qsl(url.query)))
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint:disable=arguments-differ
+        pass
+
+
+def serve(handler, host='127.0.0.1', port=0):
+    """start a Server answering with handler(path, query) -> (status, json-able payload) in a background thread"""
+    server = Server((host, port), Handler)
+    server.handler = handler
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve mock FlightXML2 and FlightStats schedules APIs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="milliseconds added to every request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with a 503")
+    parser.add_argument("--max-result-size", type=int, default=DEFAULT_MAX_RESULT_SIZE,
+                        help="initial howMany limit of paginated commands")
+    parser.add_argument("--flights-per-route", type=int, default=1, help="daily flights of every route")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    upstream = MockUpstream(latency=args.latency / 1000, error_rate=args.error_rate,
+                            max_result_size=args.max_result_size, seed=args.seed,
+                            flights_per_route=args.flights_per_route)
+    print("{} synthetic flights a day".format(len(upstream.flights.slots)))
+    server = Server((args.host, args.port), Handler)
+    server.handler = upstream
+    print("FlightXML2:          ", server.flightxml_url)
+    print("FlightStats schedules:", server.schedules_url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+# encoding: utf-8
+'''
+Client-side rate limiting and call accounting.
+
+FlightXML2 and FlightStats both bill per call and throttle on their side. A RateLimiter
+hands out calls from a token bucket - shared between threads, or between processes
+when the bucket lives in a SQLite file - and counts calls per account and command (in the
+same SQLite file, so per-account limits hold across processes too).
+
+    from flightstats import flightaware
+    from flightstats.ratelimit import RateLimiter, SqliteTokenBucket
+    flightaware.RATE_LIMITER = RateLimiter(SqliteTokenBucket("/var/tmp/flightaware.rate", rate=5, capacity=10))
+
+'''
+from __future__ import unicode_literals, division, print_function, absolute_import
+
+import time
+import sqlite3
+import threading
+from collections import Counter
+
+
+class RateLimitExceeded(Exception):
+    """raised instead of waiting, when the limiter doesn't block or would wait too long"""
+
+
+class TokenBucket(object):
+    """Thread-safe token bucket
+
+    rate     - tokens added per second, > 0
+    capacity - max tokens, i.e. the largest burst, >= 1 (a call takes a whole token).
+               Defaults to one second worth of tokens.
+    """
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("rate must be > 0, not {!r}".format(rate))
+        if capacity is not None and capacity < 1:
+            raise ValueError("capacity must be >= 1 to hold the token of a call, not {!r}".format(capacity))
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self._tokens = self.capacity
+        self._updated_at = time.time()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, tokens=1):
+        """take tokens if available and return 0, otherwise return the seconds until they will be"""
+        with self._lock:
+            now = time.time()
+            available, wait = self._take(self._tokens, self._updated_at, now, tokens)
+            self._tokens, self._updated_at = available, now
+            return wait
+
+    def _take(self, available, updated_at, now, tokens):
+        """(tokens left, seconds to wait) after trying to take tokens at now"""
+        available = min(self.capacity, available + (now - updated_at) * self.rate)
+        if available >= tokens:
+            return available - tokens, 0
+        return available, (tokens - available) / self.rate
+
+
+class SqliteTokenBucket(TokenBucket):
+    """Token bucket kept in a SQLite file, so every process using the file shares it"""
+
+    def __init__(self, path, rate, capacity=None, name="default"):
+        super(SqliteTokenBucket, self).__init__(rate, capacity)
+        self.path = path
+        self.name = name
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL, updated_at REAL)")
+        self._conn.execute("INSERT OR IGNORE INTO buckets VALUES (?, ?, ?)", (name, self.capacity, time.time()))
+
+    def try_acquire(self, tokens=1):
+        with self._lock:
+            # BEGIN IMMEDIATE takes the database write lock, which serializes all processes
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                available, updated_at = self._conn.execute("SELECT tokens, updated_at FROM buckets WHERE name = ?",
+                                                           (self.name,)).fetchone()
+                now = time.time()
+                available, wait = self._take(available, updated_at, now, tokens)
+                self._conn.execute("UPDATE buckets SET tokens = ?, updated_at = ? WHERE name = ?",
+                                   (available, now, self.name))
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return wait
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CallCounter(object):
+    """Thread-safe count of calls per (account, command)"""
+
+    def __init__(self):
+        self._calls = Counter()
+        self._lock = threading.Lock()
+
+    def reserve(self, account, command, limit=None):
+        """count one call, unless account already made limit calls - then return False"""
+        with self._lock:
+            if limit is not None and sum(calls for (an_account, _), calls in self._calls.items()
+                                         if an_account == account) >= limit:
+                return False
+            self._calls[(account, command)] += 1
+            return True
+
+    def release(self, account, command):
+        """uncount a reserved call that wasn't made"""
+        with self._lock:
+            self._calls[(account, command)] -= 1
+
+    def counts(self):
+        """Counter {(account, command): calls}"""
+        with self._lock:
+            return Counter(self._calls)
+
+
+class SqliteCallCounter(CallCounter):
+    """Call counts kept in a SQLite file, so every process using the file shares them (and the limits)"""
+
+    def __init__(self, path):
+        super(SqliteCallCounter, self).__init__()
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS calls ("
+                           "account TEXT, command TEXT, calls INTEGER, PRIMARY KEY (account, command))")
+
+    def reserve(self, account, command, limit=None):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")  # check and count in one transaction, across processes
+            try:
+                used = self._conn.execute("SELECT COALESCE(SUM(calls), 0) FROM calls WHERE account = ?",
+                                          (account,)).fetchone()[0]
+                reserved = limit is None or used < limit
+                if reserved:
+                    self._add(account, command, 1)
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return reserved
+
+    def release(self, account, command):
+        with self._lock:
+            self._add(account, command, -1)
+
+    def _add(self, account, command, calls):
+        self._conn.execute("INSERT OR IGNORE INTO calls VALUES (?, ?, 0)", (account, command))
+        self._conn.execute("UPDATE calls SET calls = calls + ? WHERE account = ? AND command = ?",
+                           (calls, account, command))
+
+    def counts(self):
+        with self._lock:
+            return Counter({(account, command): calls for account, command, calls in
+                            self._conn.execute("SELECT account, command, calls FROM calls")})
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class RateLimiter(object):
+    """Applies a token bucket to API calls and counts them
+
+    block   - wait for a token (True) or raise RateLimitExceeded right away (False)
+    timeout - when blocking, raise RateLimitExceeded rather than wait longer than this
+    limits  - optional {account: max calls}, RateLimitExceeded once an account used them up
+    counter - CallCounter. By default the counts live next to the bucket: in its SQLite file for a
+              SqliteTokenBucket (so the limits hold across processes), else in memory
+    """
+
+    def __init__(self, bucket, block=True, timeout=None, limits=None, counter=None):
+        self.bucket = bucket
+        self.block = block
+        self.timeout = timeout
+        self.limits = dict(limits or {})
+        if counter is None:
+            counter = SqliteCallCounter(bucket.path) if isinstance(bucket, SqliteTokenBucket) else CallCounter()
+        self.counter = counter
+
+    @property
+    def calls(self):
+        """Counter {(account, command): calls}"""
+        return self.counter.counts()
+
+    def acquire(self, account, command):
+        """wait for (or refuse) permission to make one call of command for account"""
+        limit = self.limits.get(account)
+        if not self.counter.reserve(account, command, limit):
+            raise RateLimitExceeded("{} used all of its {} calls".format(account, limit))
+        try:
+            waited = 0
+            wait = self.bucket.try_acquire()
+            while wait:
+                if not self.block or (self.timeout is not None and waited + wait > self.timeout):
+                    raise RateLimitExceeded("no {} call available for {:.2f}s".format(command, wait))
+                time.sleep(wait)
+                waited += wait
+                wait = self.bucket.try_acquire()
+        except BaseException:
+            self.counter.release(account, command)
+            raise
+
+    def used(self, account):
+        """number of calls made for account"""
+        return sum(calls for (an_account, _), calls in self.calls.items() if an_account == account)
+
+    def usage(self):
+        """{account: {command: calls}}"""
+        usage = {}
+        for (account, command), calls in self.calls.items():
+            if calls:
+                usage.setdefault(account, {})[command] = calls
+        return usage
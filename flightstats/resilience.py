@@ -0,0 +1,171 @@
+# encoding: utf-8
+'''
+Retries and circuit breaking for API calls.
+
+Transient failures (timeouts, connection errors, 429 and 5xx replies) are retried with
+jittered exponential backoff. Retries draw on a budget so that they can add only a
+fraction of extra load while upstream is struggling. Each endpoint has a circuit
+breaker: after enough consecutive failures it opens and calls fail fast with
+CircuitOpenError until a trial call succeeds again.
+
+'''
+from __future__ import unicode_literals, division, print_function, absolute_import
+
+import time
+import random
+import threading
+
+import requests
+
+from flightstats.ratelimit import RateLimitExceeded
+
+TRANSIENT_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+
+
+class TransientError(Exception):
+    """the API answered with a status code worth retrying"""
+
+    def __init__(self, response):
+        super(TransientError, self).__init__("{} {}".format(response.status_code, response.url))
+        self.response = response
+
+
+class CircuitOpenError(Exception):
+    """the endpoint's circuit breaker is open - the call was not made"""
+
+
+RETRYABLE_ERRORS = (requests.Timeout, requests.ConnectionError, TransientError)
+# raised before the request is sent - they say nothing about the endpoint's health
+LOCAL_ERRORS = (RateLimitExceeded, requests.exceptions.MissingSchema, requests.exceptions.InvalidSchema,
+                requests.exceptions.InvalidURL)
+
+
+class RetryBudget(object):
+    """Every first attempt deposits `ratio` tokens, every retry withdraws one.
+    min_tokens keeps a few retries available when traffic is low."""
+
+    def __init__(self, ratio=0.2, min_tokens=10, max_tokens=100):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = self.min_tokens = min_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self):
+        """True if a retry may be made"""
+        with self._lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class CircuitBreaker(object):
+    """closed -> open after failure_threshold consecutive failures,
+    open -> half open after reset_timeout seconds, half open -> closed on the first success"""
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self, endpoint=""):
+        """raise CircuitOpenError unless a call may go through"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.time() - self.opened_at < self.reset_timeout:
+                    raise CircuitOpenError("circuit open for {}".format(endpoint))
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN:
+                if self._trial_in_flight:  # only one trial call at a time
+                    raise CircuitOpenError("circuit half open for {}".format(endpoint))
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_not_called(self):
+        """the call allowed by before_call() was not made - a half open breaker may let another one through"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.time()
+
+
+class Resilience(object):
+    """Retry policy, retry budget and one circuit breaker per endpoint
+
+    max_attempts - attempts per call, including the first one
+    base_delay   - backoff before the first retry, doubled for each further retry
+    max_delay    - cap on the backoff
+    The actual sleep is drawn uniformly from [0, backoff] ("full jitter").
+    """
+
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=8, budget=None,
+                 failure_threshold=5, reset_timeout=30, retry_on=RETRYABLE_ERRORS, local_errors=LOCAL_ERRORS):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget if budget is not None else RetryBudget()
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.retry_on = retry_on
+        self.local_errors = local_errors
+        self.breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, endpoint):
+        """the circuit breaker of endpoint"""
+        with self._lock:
+            breaker = self.breakers.get(endpoint)
+            if breaker is None:
+                breaker = self.breakers[endpoint] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return breaker
+
+    def backoff(self, attempt):
+        """seconds to sleep after failed attempt number `attempt` (1 based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def call(self, endpoint, func):
+        """return func(), retrying transient errors. Raises CircuitOpenError while endpoint is failing."""
+        breaker = self.breaker(endpoint)
+        breaker.before_call(endpoint)
+        self.budget.deposit()
+        attempt = 1
+        while True:
+            try:
+                result = func()
+            except self.retry_on:
+                breaker.record_failure()
+                if attempt >= self.max_attempts or not self.budget.withdraw():
+                    raise
+                time.sleep(self.backoff(attempt))
+                attempt += 1
+                breaker.before_call(endpoint)
+            except self.local_errors:
+                breaker.record_not_called()  # e.g. RateLimitExceeded: no request was sent
+                raise
+            except Exception:
+                breaker.record_success()  # upstream answered, the problem is on our side
+                raise
+            else:
+                breaker.record_success()
+                return result
@@ -0,0 +1,204 @@
+# encoding: utf-8
+'''
+The airline route network of data/routes.csv as a compressed sparse row (CSR) graph.
+
+Airports get dense integer ids. Route i of airport a is edge offsets[a] + i, and the edges
+of each airport are sorted by airline and then destination, so all the queries below are
+array slices plus a binary search:
+
+    graph = RouteGraph.from_csv()
+    graph.destinations("FRA")               # airports with a route from FRA
+    graph.origins("FRA")                    # airports with a route to FRA
+    graph.destinations("FRA", airline="LH")
+
+Routes are numbered in the order they were given, i.e. by row of datasets.routes() for
+from_csv(); graph.rows maps each edge back to its route:
+
+    graph.route_distances()[row]            # great-circle km of row `row` of datasets.routes()
+    graph.distances()[edge] == graph.route_distances()[graph.rows[edge]]
+
+'''
+from __future__ import unicode_literals, division, print_function, absolute_import
+
+from array import array
+from bisect import bisect_left, bisect_right
+
+from flightstats import datasets
+from flightstats.geo import np, haversine_km, haversine_km_array
+
+
+class RouteGraph(object):
+    """CSR adjacency of airline routes
+
+    codes, airlines - airport id -> code, airline id -> code
+    origins, destinations, route_airlines, codeshares, stops, equipment - one value per route (ids for the first three)
+    The per-edge arrays are in edge order; rows[edge] is the route (the index into these lists) of an edge.
+    """
+
+    def __init__(self, codes, airlines, origins, destinations, route_airlines, codeshares, stops, equipment):
+        self.codes = list(codes)  # airport id -> code
+        self.airport_ids = {code: airport_id for airport_id, code in enumerate(self.codes)}
+        self.airlines = list(airlines)  # airline id -> code
+        self.airline_ids = {code: airline_id for airline_id, code in enumerate(self.airlines)}
+        origins, destinations, route_airlines = _tolist(origins), _tolist(destinations), _tolist(route_airlines)
+        codeshares, stops = _tolist(codeshares), _tolist(stops)
+        number_of_airports, number_of_airlines = len(self.codes), len(self.airlines)
+
+        # forward CSR: edges of airport a are offsets[a]:offsets[a + 1], sorted by airline and destination
+        edges = sorted(range(len(origins)), key=lambda route: (
+            (origins[route] * number_of_airlines + route_airlines[route]) * number_of_airports + destinations[route]))
+        self.offsets = _offsets((origins[route] for route in edges), number_of_airports)
+        self.rows = array(str("i"), edges)  # edge -> route
+        self.sources = array(str("i"), (origins[route] for route in edges))  # edge -> origin airport id
+        self.edge_airlines = array(str("i"), (route_airlines[route] for route in edges))
+        self.targets = array(str("i"), (destinations[route] for route in edges))
+        self.codeshares = array(str("b"), (1 if codeshares[route] else 0 for route in edges))
+        self.stops = array(str("b"), (stops[route] for route in edges))
+        self.equipment = [equipment[route] for route in edges]
+
+        # reverse CSR: in_edges[in_offsets[a]:in_offsets[a + 1]] are the forward edges into airport a,
+        # sorted by airline and origin like the forward ones
+        targets, edge_airlines, sources = self.targets, self.edge_airlines, self.sources
+        in_edges = sorted(range(len(edges)), key=lambda edge: (
+            (targets[edge] * number_of_airlines + edge_airlines[edge]) * number_of_airports + sources[edge]))
+        self.in_offsets = _offsets((targets[edge] for edge in in_edges), number_of_airports)
+        self.in_edges = array(str("i"), in_edges)
+        self.in_edge_airlines = array(str("i"), (edge_airlines[edge] for edge in in_edges))
+        self._coordinates = None
+        self._distances = None
+        self._route_distances = None
+
+    @classmethod
+    def from_csv(cls, path=None):
+        """the graph of data/routes.csv (or of the routes csv at path)"""
+        table = datasets.routes(path)
+        return cls(table.categories("airport_st"), table.categories("airline"), table["airport_st"],
+                   table["airport_end"], table["airline"], table["codeshare"], table["stops"],
+                   table.strings("equipment"))
+
+    def __len__(self):
+        """number of airports"""
+        return len(self.codes)
+
+    @property
+    def number_of_routes(self):
+        return len(self.targets)
+
+    def _edge_range(self, offsets, airlines, airport_id, airline):
+        """the (start, end) edge slice of airport_id, narrowed to airline"""
+        start, end = offsets[airport_id], offsets[airport_id + 1]
+        if airline is not None:
+            airline_id = self.airline_ids.get(airline, -1)
+            start, end = bisect_left(airlines, airline_id, start, end), bisect_right(airlines, airline_id, start, end)
+        return start, end
+
+    def destination_ids(self, airport_id, airline=None, include_codeshares=True):
+        """ids of the airports with a route from airport_id (sorted, no duplicates)"""
+        start, end = self._edge_range(self.offsets, self.edge_airlines, airport_id, airline)
+        if include_codeshares:
+            return sorted(set(self.targets[start:end]))
+        return sorted(set(self.targets[edge] for edge in range(start, end) if not self.codeshares[edge]))
+
+    def origin_ids(self, airport_id, airline=None, include_codeshares=True):
+        """ids of the airports with a route to airport_id (sorted, no duplicates)"""
+        start, end = self._edge_range(self.in_offsets, self.in_edge_airlines, airport_id, airline)
+        return sorted(set(self.sources[edge] for edge in self.in_edges[start:end]
+                          if include_codeshares or not self.codeshares[edge]))
+
+    def destinations(self, code, airline=None, include_codeshares=True):
+        """codes of the airports with a route from code, optionally only on airline (sorted)"""
+        airport_id = self.airport_ids.get(code)
+        if airport_id is None:
+            return []
+        return sorted(self.codes[target] for target in self.destination_ids(airport_id, airline, include_codeshares))
+
+    def origins(self, code, airline=None, include_codeshares=True):
+        """codes of the airports with a route to code, optionally only on airline (sorted)"""
+        airport_id = self.airport_ids.get(code)
+        if airport_id is None:
+            return []
+        return sorted(self.codes[source] for source in self.origin_ids(airport_id, airline, include_codeshares))
+
+    def airlines_between(self, origin, destination, include_codeshares=True):
+        """codes of the airlines flying origin -> destination"""
+        origin_id, destination_id = self.airport_ids.get(origin), self.airport_ids.get(destination)
+        if origin_id is None or destination_id is None:
+            return []
+        return sorted(set(self.airlines[self.edge_airlines[edge]]
+                          for edge in range(self.offsets[origin_id], self.offsets[origin_id + 1])
+                          if self.targets[edge] == destination_id
+                          and (include_codeshares or not self.codeshares[edge])))
+
+    def has_route(self, origin, destination, include_codeshares=True):
+        """True if any airline flies origin -> destination"""
+        return bool(self.airlines_between(origin, destination, include_codeshares))
+
+    def coordinates(self):
+        """airport id -> (latitude, longitude) or None, from data/airports.csv and then FA_AIRPORTS (loaded once)"""
+        if self._coordinates is None:
+            from flightstats.spatial import airport_coordinates
+            from flightstats.airport_db import FA_AIRPORTS
+            by_code = airport_coordinates()
+            self._coordinates = [by_code[code] if code in by_code else FA_AIRPORTS.coordinates(code)
+                                 for code in self.codes]
+        return self._coordinates
+
+    def distances(self):
+        """
+        Great-circle km of every route, in edge order (nan where an airport has no coordinates), computed once.
+        A numpy array when numpy is installed, else an array('d').
+        """
+        if self._distances is None:
+            nan = float("nan")
+            coordinates = self.coordinates()
+            latitudes = [point[0] if point else nan for point in coordinates]
+            longitudes = [point[1] if point else nan for point in coordinates]
+            if np is not None:
+                latitudes, longitudes = np.array(latitudes), np.array(longitudes)
+                sources, targets = np.asarray(self.sources), np.asarray(self.targets)
+                self._distances = haversine_km_array(latitudes[sources], longitudes[sources],
+                                                     latitudes[targets], longitudes[targets])
+            else:
+                self._distances = array(str("d"), (
+                    haversine_km(latitudes[source], longitudes[source], latitudes[target], longitudes[target])
+                    if coordinates[source] and coordinates[target] else nan
+                    for source, target in zip(self.sources, self.targets)))
+        return self._distances
+
+    def route_distances(self):
+        """
+        distances() by route instead of by edge: the distance column of the route table (row i of
+        datasets.routes() for from_csv()), computed once. A numpy array when numpy is installed, else an array('d').
+        """
+        if self._route_distances is None:
+            distances = self.distances()
+            if np is not None:
+                by_route = np.empty(len(distances))
+                by_route[np.asarray(self.rows)] = distances
+            else:
+                by_route = array(str("d"), distances)
+                for edge, route in enumerate(self.rows):
+                    by_route[route] = distances[edge]
+            self._route_distances = by_route
+        return self._route_distances
+
+    def degree(self, code):
+        """number of routes (edges, one per airline) out of code"""
+        airport_id = self.airport_ids.get(code)
+        if airport_id is None:
+            return 0
+        return self.offsets[airport_id + 1] - self.offsets[airport_id]
+
+
+def _tolist(values):
+    """a list of python numbers from a list, array, memoryview or numpy array"""
+    return values.tolist() if hasattr(values, "tolist") else list(values)
+
+def _offsets(sorted_ids, number_of_ids):
+    """CSR offsets of a sorted sequence of ids"""
+    offsets = array(str("i"), [0] * (number_of_ids + 1))
+    for an_id in sorted_ids:
+        offsets[an_id + 1] += 1
+    for an_id in range(number_of_ids):
+        offsets[an_id + 1] += offsets[an_id]
+    return offsets
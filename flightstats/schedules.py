@@ -0,0 +1,77 @@
+# encoding: utf-8
+'''
+Created on October 24, 2016
+
+@author: philippschw
+
+FlightStats scheduled flights API: https://developer.flightstats.com/api-docs/scheduledFlights/v1
+
+'''
+from __future__ import unicode_literals, division, print_function, absolute_import
+
+import os
+
+import requests
+from flightstats.http_client import CLIENT
+from flightstats.resilience import Resilience, TransientError, TRANSIENT_STATUS_CODES
+
+APPLICATION_ID = os.environ['Flightstats_ID']
+APPLICATION_KEY = os.environ["FLIGTHSTATS_Key"]
+URL = "https://api.flightstats.com/flex/schedules/rest/v1/json/"
+
+RATE_LIMITER = None  # set to a flightstats.ratelimit.RateLimiter to limit and count calls
+
+# retries transient errors and fails fast (CircuitOpenError) while an endpoint keeps failing. None to disable
+RESILIENCE = Resilience()
+
+def send_request(search_url, command="schedules"):
+    """call the FlightStats schedules API"""
+    resilience = RESILIENCE
+    try:
+        if resilience is not None:
+            return resilience.call(command, lambda: _request(search_url, command))
+        return _request(search_url, command)
+    except TransientError:
+        return None
+
+def _request(search_url, command):
+    """one HTTP request - raises TransientError on replies worth retrying"""
+    rate_limiter = RATE_LIMITER
+    if rate_limiter is not None:
+        rate_limiter.acquire(APPLICATION_ID, command)
+    params = dict(appId=APPLICATION_ID, appKey=APPLICATION_KEY, codeType="IATA")
+    resp = CLIENT.get(URL + search_url, params=params)
+    if resp.status_code == requests.codes.ok:  # @UndefinedVariable pylint:disable=no-member
+        return resp.json()
+    if resp.status_code in TRANSIENT_STATUS_CODES:
+        raise TransientError(resp)
+
+def arrivals(from_airport, to_airport, arrival_date):
+    """
+        finds arrivals
+        @from_airport The airport code (IATA) of the departure airport (required)
+        @to_airport The airport code (IATA) of the arrival airport (required)
+        @arrival_date arrival date (required)
+    """
+    search_url = ("from/{from_airport}/to/{to_airport}/arriving/" +
+                  "{arrival_year}/{arrival_month}/{arrival_day}").format(from_airport=from_airport,
+                                                                         to_airport=to_airport,
+                                                                         arrival_year=arrival_date.year,
+                                                                         arrival_month=arrival_date.month,
+                                                                         arrival_day=arrival_date.day)
+    return send_request(search_url, "arriving")
+
+def departures(from_airport, to_airport, departure_date):
+    """
+        finds departure
+        @from_airport The airport code (IATA) of the departure airport (required)
+        @to_airport The airport code (IATA) of the arrival airport (required)
+        @departure_date departure date (required)
+    """
+    search_url = ("from/{from_airport}/to/{to_airport}/departing/" +
+                  "{departure_year}/{departure_month}/{departure_day}").format(from_airport=from_airport,
+                                                                               to_airport=to_airport,
+                                                                               departure_year=departure_date.year,
+                                                                               departure_month=departure_date.month,
+                                                                               departure_day=departure_date.day)
+    return send_request(search_url, "departing")
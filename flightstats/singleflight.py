@@ -0,0 +1,66 @@
+# encoding: utf-8
+'''
+Request coalescing ("single flight").
+
+When several threads ask for the same thing at the same moment, only the first one
+(the leader) calls out; the others wait for it and get a copy of its result, or its
+exception. A key is only shared while its call is in flight - nothing is cached.
+
+'''
+from __future__ import unicode_literals, division, print_function, absolute_import
+
+import copy
+import threading
+
+
+class _Call(object):
+    """one in-flight call"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight(object):
+    """Joins concurrent calls with the same key onto one outstanding call"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.calls = 0  # calls made
+        self.joined = 0  # calls answered by another caller's call
+
+    def do(self, key, func):
+        """return func(), unless a call for key is already in flight - then wait for and return its result"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+                leader = True
+            else:
+                call.followers += 1
+                self.joined += 1
+                leader = False
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            # each caller gets its own copy, callers are used to modifying their results
+            return copy.deepcopy(call.result)
+        result = None
+        try:
+            result = func()
+            return result
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            if call.followers:
+                # snapshot before the leader's caller gets (and maybe modifies) the result
+                call.result = copy.deepcopy(result)
+            call.done.set()
@@ -0,0 +1,134 @@
+# encoding: utf-8
+'''
+Nearest-airport and radius queries.
+
+AirportIndex is a k-d tree over the airports' unit-sphere (x, y, z) coordinates, so
+straight-line distances in the tree order points exactly like great-circle distances
+and there is no trouble at the poles or the date line.
+
+    index = AirportIndex.from_fa_airports()
+    index.nearest(40.64, -73.78, k=3)        # [('JFK', 0.1), ('LGA', 17.4), ...]
+    index.within_radius(32.0, 34.9, 100)     # airports within 100 km, nearest first
+
+'''
+from __future__ import unicode_literals, division, print_function, absolute_import
+
+import heapq
+
+from flightstats import datasets
+from flightstats.geo import unit_vector, chord_to_km, km_to_chord
+
+_LEAF_SIZE = 8
+
+
+def _coordinate_rows(path=None):
+    """(IATA code, ICAO code, latitude, longitude) of every airport in data/airports.csv (or path)"""
+    table = datasets.airports(path)
+    return zip(table.strings("code_iata"), table.strings("code_icao"), table["latitude"].tolist(),
+               table["longitude"].tolist())
+
+def airport_coordinates(path=None):
+    """IATA code -> (latitude, longitude) from data/airports.csv (or the airports csv at path)"""
+    return {iata: (latitude, longitude) for iata, _, latitude, longitude in _coordinate_rows(path) if iata}
+
+
+class AirportIndex(object):
+    """k-d tree over airports
+
+    airports - iterable of (code, latitude, longitude)
+    """
+
+    def __init__(self, airports):
+        self.codes, self.latitudes, self.longitudes, self.points = [], [], [], []
+        for code, latitude, longitude in airports:
+            self.codes.append(code)
+            self.latitudes.append(latitude)
+            self.longitudes.append(longitude)
+            self.points.append(unit_vector(latitude, longitude))
+        # the tree is implicit: order[low:high] is a node, split at its middle element on axis depth % 3
+        self.order = list(range(len(self.points)))
+        self._build(0, len(self.order), 0)
+
+    @classmethod
+    def from_fa_airports(cls):
+        """index of the FlightAware airport table, by IATA code"""
+        from flightstats.airport_db import FA_AIRPORTS
+        return cls((code,) + FA_AIRPORTS.coordinates(code) for code in FA_AIRPORTS)
+
+    @classmethod
+    def from_csv(cls, path=None):
+        """index of data/airports.csv (or the airports csv at path), by IATA code (ICAO when there is none)"""
+        return cls((iata or icao, latitude, longitude) for iata, icao, latitude, longitude in _coordinate_rows(path)
+                   if iata or icao)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _build(self, low, high, depth):
+        if high - low <= _LEAF_SIZE:
+            return
+        axis = depth % 3
+        points = self.points
+        self.order[low:high] = sorted(self.order[low:high], key=lambda index: points[index][axis])
+        middle = (low + high) // 2
+        self._build(low, middle, depth + 1)
+        self._build(middle + 1, high, depth + 1)
+
+    def nearest(self, latitude, longitude, k=1):
+        """the k nearest airports as [(code, km)], nearest first"""
+        k = min(k, len(self.codes))
+        if k <= 0:
+            return []
+        heap = []  # max-heap of the best k so far: (-squared chord, index)
+        self._nearest(unit_vector(latitude, longitude), k, heap, 0, len(self.order), 0)
+        return [(self.codes[index], chord_to_km((-negative) ** 0.5)) for negative, index in sorted(heap, reverse=True)]
+
+    def _nearest(self, target, k, heap, low, high, depth):
+        points, order = self.points, self.order
+        if high - low <= _LEAF_SIZE:
+            for index in order[low:high]:
+                self._offer(target, k, heap, index)
+            return
+        middle = (low + high) // 2
+        index = order[middle]
+        axis = depth % 3
+        difference = target[axis] - points[index][axis]
+        near, far = ((low, middle), (middle + 1, high)) if difference < 0 else ((middle + 1, high), (low, middle))
+        self._nearest(target, k, heap, near[0], near[1], depth + 1)
+        self._offer(target, k, heap, index)
+        if len(heap) < k or difference * difference < -heap[0][0]:
+            self._nearest(target, k, heap, far[0], far[1], depth + 1)
+
+    def _offer(self, target, k, heap, index):
+        point = self.points[index]
+        squared = (target[0] - point[0]) ** 2 + (target[1] - point[1]) ** 2 + (target[2] - point[2]) ** 2
+        if len(heap) < k:
+            heapq.heappush(heap, (-squared, index))
+        elif squared < -heap[0][0]:
+            heapq.heapreplace(heap, (-squared, index))
+
+    def within_radius(self, latitude, longitude, km):
+        """airports within km of the point as [(code, km)], nearest first"""
+        found = []
+        radius = km_to_chord(km)
+        self._within(unit_vector(latitude, longitude), radius * radius, found, 0, len(self.order), 0)
+        found.sort()
+        return [(self.codes[index], chord_to_km(squared ** 0.5)) for squared, index in found]
+
+    def _within(self, target, squared_radius, found, low, high, depth):
+        points, order = self.points, self.order
+        if high - low <= _LEAF_SIZE:
+            candidates = order[low:high]
+        else:
+            middle = (low + high) // 2
+            candidates = [order[middle]]
+            difference = target[depth % 3] - points[order[middle]][depth % 3]
+            if difference < 0 or difference * difference <= squared_radius:
+                self._within(target, squared_radius, found, low, middle, depth + 1)
+            if difference >= 0 or difference * difference <= squared_radius:
+                self._within(target, squared_radius, found, middle + 1, high, depth + 1)
+        for index in candidates:
+            point = points[index]
+            squared = (target[0] - point[0]) ** 2 + (target[1] - point[1]) ** 2 + (target[2] - point[2]) ** 2
+            if squared <= squared_radius:
+                found.append((squared, index))
@@ -0,0 +1,45 @@
+# encoding: utf-8
+'''
+Airport time zones.
+
+airport_timezone() resolves an IATA or ICAO code to its pytz time zone once per process
+and caches it. localize() and local_dates() convert whole lists of epoch timestamps to
+airport-local datetimes/dates, resolving each distinct airport only once.
+
+'''
+from __future__ import unicode_literals, division, print_function, absolute_import
+
+import datetime
+
+from pytz import timezone as pytz_timezone
+
+from flightstats.airport_db import FA_AIRPORTS, AIRPORTS_ICAO_TO_IATA
+
+_TIMEZONES = {}  # airport code -> tzinfo or None
+
+def airport_timezone(airport_code):
+    """tzinfo of an airport given by IATA or ICAO code, None when unknown"""
+    try:
+        return _TIMEZONES[airport_code]
+    except KeyError:
+        pass
+    iata_code = AIRPORTS_ICAO_TO_IATA.get(airport_code, airport_code)
+    timezone_name = FA_AIRPORTS.timezone(iata_code)
+    tz = pytz_timezone(timezone_name) if timezone_name else None
+    _TIMEZONES[airport_code] = tz
+    return tz
+
+def localize(timestamps, airport_codes):
+    """
+    Datetimes in the local time of each airport, for parallel lists of epoch seconds and airport codes.
+    Like datetime.fromtimestamp(timestamp, airport tz): unknown airports give the local time of this machine,
+    missing timestamps give None.
+    """
+    timezones = {code: airport_timezone(code) for code in set(airport_codes)}
+    fromtimestamp = datetime.datetime.fromtimestamp
+    return [fromtimestamp(timestamp, timezones[code]) if timestamp is not None else None
+            for timestamp, code in zip(timestamps, airport_codes)]
+
+def local_dates(timestamps, airport_codes):
+    """like localize(), but dates"""
+    return [local.date() if local is not None else None for local in localize(timestamps, airport_codes)]
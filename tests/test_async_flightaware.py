@@ -0,0 +1,60 @@
+# encoding: utf-8
+'''
+AsyncSingleFlight (python 3 only, like flightstats.async_flightaware).
+'''
+from __future__ import unicode_literals, division, print_function, absolute_import
+
+import os
+import asyncio
+import unittest
+
+os.environ.setdefault('FLIGHTAWARE_USERNAME', 'test')
+os.environ.setdefault('FLIGHTAWARE_API_KEY', 'test')
+
+from flightstats.async_flightaware import AsyncSingleFlight
+
+
+class AsyncSingleFlightTest(unittest.TestCase):
+
+    def run_async(self, coroutine):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            loop.close()
+
+    def test_one_call_copies_of_the_result(self):
+        flight, made = AsyncSingleFlight(), []
+
+        async def call():
+            made.append(1)
+            await asyncio.sleep(0.01)
+            return {"flights": [1]}
+
+        async def main():
+            return await asyncio.gather(*[flight.do("a", call) for _ in range(5)])
+        results = self.run_async(main())
+        self.assertEqual(len(made), 1)
+        self.assertEqual(results, [{"flights": [1]}] * 5)
+        self.assertEqual(len(set(id(result) for result in results)), 5)
+
+    def test_cancelled_leader_leaves_the_call_running(self):
+        flight = AsyncSingleFlight()
+
+        async def call():
+            await asyncio.sleep(0.05)
+            return {"flights": [1]}
+
+        async def main():
+            leader = asyncio.ensure_future(asyncio.wait_for(flight.do("a", call), 0.01))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(flight.do("a", call))
+            return await asyncio.gather(leader, follower, return_exceptions=True)
+        leader, follower = self.run_async(main())
+        self.assertIsInstance(leader, asyncio.TimeoutError)
+        self.assertEqual(follower, {"flights": [1]})
+        self.assertEqual(flight.calls, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+# encoding: utf-8
+'''
+Harvester with a journal: resuming after a crash, and rerunning with another prefilter.
+'''
+from __future__ import unicode_literals, division, print_function, absolute_import
+
+import os
+import shutil
+import datetime
+import tempfile
+import unittest
+
+os.environ.setdefault('Flightstats_ID', 'test')
+os.environ.setdefault('FLIGTHSTATS_Key', 'test')
+
+from flightstats.harvest import Harvester, RoutePrefilter
+from flightstats.journal import Journal
+
+HUB = "FRA"
+DATES = [datetime.date(2016, 10, 25), datetime.date(2016, 10, 26)]
+AIRPORTS = ["JFK", "LHR", "NRT", "CDG", "SYD", "GRU", "DXB", "ORD"]
+ROUTES = {"JFK", "LHR", "NRT", "CDG"}  # the airports with a route from the hub
+CODESHARE_ROUTES = {"SYD"}
+FLIGHTS = {"JFK": 3, "LHR": 2, "NRT": 1, "SYD": 1, "GRU": 1}  # daily flights from the hub, also off the graph
+
+
+class Graph(object):
+    """the part of a RouteGraph that RoutePrefilter uses"""
+    number_of_routes = len(ROUTES) + len(CODESHARE_ROUTES)
+
+    def destinations(self, code, include_codeshares=True):
+        return sorted(ROUTES | CODESHARE_ROUTES) if include_codeshares else sorted(ROUTES)
+
+    origins = destinations
+
+
+class Crash(BaseException):
+    pass
+
+
+class FakeHarvester(Harvester):
+    """answers from FLIGHTS, remembers the queries, and crashes after crash_after of them"""
+
+    def __init__(self, *args, **kwargs):
+        self.crash_after = kwargs.pop("crash_after", None)
+        super(FakeHarvester, self).__init__(HUB, max_workers=1, *args, **kwargs)
+        self.fetched = []
+
+    def fetch(self, airport, date):
+        if self.crash_after is not None and len(self.fetched) >= self.crash_after:
+            raise Crash()
+        self.fetched.append((airport, date))
+        return dict(scheduledFlights=[dict(carrierFsCode="LH", flightNumber="{}".format(number),
+                                           arrivalAirportFsCode=airport) for number in range(FLIGHTS.get(airport, 0))])
+
+
+def prefilter(seed=1, **kwargs):
+    return RoutePrefilter(Graph(), seed=seed, **kwargs)
+
+def flights(store):
+    return sorted(store.rows())
+
+
+class HarvestJournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.journal = Journal(os.path.join(self.directory, "harvest.journal"))
+
+    def tearDown(self):
+        self.journal.close()
+        shutil.rmtree(self.directory)
+
+    def test_resume_after_crash(self):
+        fresh = FakeHarvester(prefilter=prefilter(audit_rate=0.5))
+        expected = fresh.run(DATES, AIRPORTS)
+        self.assertTrue(fresh.stats["skipped"] and fresh.stats["audited"])
+
+        crashed = FakeHarvester(prefilter=prefilter(audit_rate=0.5), journal=self.journal, crash_after=5)
+        with self.assertRaises(Crash):
+            crashed.run(DATES, AIRPORTS)
+        # another seed: the audit sample comes from the journal, not from a new draw
+        resumed = FakeHarvester(prefilter=prefilter(audit_rate=0.5, seed=2), journal=self.journal)
+        store = resumed.run(DATES, AIRPORTS)
+
+        self.assertEqual(flights(store), flights(expected))
+        self.assertEqual(sorted(crashed.fetched + resumed.fetched), sorted(fresh.fetched))
+        self.assertEqual(resumed.stats["resumed"], len(crashed.fetched))
+        for name in ("skipped", "audited", "audit_flights", "flights"):
+            self.assertEqual(resumed.stats[name], fresh.stats[name], name)
+
+        again = FakeHarvester(prefilter=prefilter(audit_rate=0.5), journal=self.journal)
+        self.assertEqual(flights(again.run(DATES, AIRPORTS)), flights(expected))
+        self.assertEqual(again.fetched, [])
+
+    def test_rerun_without_prefilter(self):
+        prefiltered = FakeHarvester(prefilter=prefilter(), journal=self.journal)
+        prefiltered.run(DATES, AIRPORTS)
+        self.assertEqual(prefiltered.stats["skipped"], 4 * len(DATES))
+
+        rerun = FakeHarvester(journal=self.journal)
+        store = rerun.run(DATES, AIRPORTS)
+        fresh = FakeHarvester()
+        self.assertEqual(flights(store), flights(fresh.run(DATES, AIRPORTS)))
+        self.assertEqual(sorted(rerun.fetched), sorted((airport, date) for date in DATES
+                                                       for airport in AIRPORTS if airport not in ROUTES))
+        self.assertEqual(rerun.stats["skipped"], 0)
+        self.assertEqual(rerun.stats["flights"], fresh.stats["flights"])
+
+    def test_rerun_with_another_prefilter(self):
+        FakeHarvester(prefilter=prefilter(), journal=self.journal).run(DATES, AIRPORTS)
+
+        rerun = FakeHarvester(prefilter=prefilter(include_codeshares=True), journal=self.journal)
+        rerun.run(DATES, AIRPORTS)
+        self.assertEqual(sorted(rerun.fetched), sorted(("SYD", date) for date in DATES))
+        self.assertEqual(rerun.stats["skipped"], 3 * len(DATES))
+        self.assertEqual(rerun.stats["flights"], sum(FLIGHTS[airport] for airport in ROUTES | CODESHARE_ROUTES
+                                                     if airport in FLIGHTS) * len(DATES))
+
+
+if __name__ == '__main__':
+    unittest.main()
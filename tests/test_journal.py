@@ -0,0 +1,91 @@
+# encoding: utf-8
+'''
+Journal, and the journaled FlightXML2 page pulls.
+'''
+from __future__ import unicode_literals, division, print_function, absolute_import
+
+import os
+import shutil
+import datetime
+import tempfile
+import unittest
+
+os.environ.setdefault('FLIGHTAWARE_USERNAME', 'test')
+os.environ.setdefault('FLIGHTAWARE_API_KEY', 'test')
+
+from flightstats import flightaware
+from flightstats.journal import Journal
+
+ROWS = 7
+
+
+def airline_flight_schedules(command, params):
+    """AirlineFlightSchedules pages over ROWS flights"""
+    offset, how_many = params["offset"], params["howMany"]
+    data = [dict(ident="LH{}".format(number), actual_ident="", departuretime=0, arrivaltime=0,
+                 origin="EDDF", destination="KJFK") for number in range(offset, min(ROWS, offset + how_many))]
+    next_offset = offset + how_many if offset + how_many < ROWS else -1
+    return dict(AirlineFlightSchedulesResult=dict(data=data, next_offset=next_offset))
+
+
+class JournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "pull.journal")
+        self.journal = Journal(self.path)
+
+    def tearDown(self):
+        self.journal.close()
+        shutil.rmtree(self.directory)
+
+    def test_record_and_reopen(self):
+        self.journal.record("job", "a", dict(flights=[1]))
+        self.journal.record_many("job", {"b": dict(skipped=True), "c": dict(audit=True)})
+        self.journal.record("other job", "a", dict(flights=[]))
+        self.journal.close()
+        self.journal = Journal(self.path)
+        self.assertEqual(self.journal.get("job", "a"), dict(flights=[1]))
+        self.assertIsNone(self.journal.get("job", "d"))
+        self.assertEqual(sorted(self.journal.results("job")), ["a", "b", "c"])
+        self.assertEqual(len(self.journal), 4)
+        self.journal.forget("job")
+        self.assertEqual(self.journal.results("job"), {})
+        self.assertEqual(len(self.journal), 1)
+
+    def test_resumed_pages(self):
+        calls = []
+
+        def counting(command, params):
+            calls.append(params["offset"])
+            return airline_flight_schedules(command, params)
+
+        def crashing(command, params):
+            if len(calls) == 2:
+                raise KeyboardInterrupt()
+            return counting(command, params)
+
+        def pull():
+            day = datetime.date(2016, 10, 25)
+            return [flight["ident"] for flight in flightaware.iter_airline_flight_schedules(
+                day, day + datetime.timedelta(days=1), origin="FRA", rows_per_page=3, journal=self.journal)]
+        flight_aware = flightaware.flight_aware
+        try:
+            flightaware.flight_aware = crashing
+            with self.assertRaises(KeyboardInterrupt):
+                pull()
+            self.assertEqual(calls, [0, 3])
+            flightaware.flight_aware = counting
+            self.assertEqual(pull(), ["LH{}".format(number) for number in range(ROWS)])
+        finally:
+            flightaware.flight_aware = flight_aware
+        self.assertEqual(calls, [0, 3, 6])  # only the page missing from the journal was fetched
+
+    def test_only_fixed_pages(self):
+        with self.assertRaises(ValueError):
+            list(flightaware.iter_pages("Scheduled", dict(airport="EDDF", howMany=15), "ScheduledResult",
+                                        journal=self.journal))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+# encoding: utf-8
+'''
+TokenBucket, SqliteTokenBucket and RateLimiter.
+'''
+from __future__ import unicode_literals, division, print_function, absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from flightstats.ratelimit import RateLimiter, RateLimitExceeded, TokenBucket, SqliteTokenBucket
+
+
+class TokenBucketTest(unittest.TestCase):
+
+    def test_invalid_settings(self):
+        for rate, capacity in ((0, None), (-1, 5), (5, 0.5), (5, 0)):
+            with self.assertRaises(ValueError):
+                TokenBucket(rate, capacity)
+
+    def test_burst_then_wait(self):
+        bucket = TokenBucket(rate=1, capacity=3)
+        self.assertEqual([bucket.try_acquire() for _ in range(3)], [0, 0, 0])
+        self.assertGreater(bucket.try_acquire(), 0.9)
+
+
+class RateLimiterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_no_block(self):
+        limiter = RateLimiter(TokenBucket(rate=0.01, capacity=2), block=False)
+        limiter.acquire("a", "Scheduled")
+        limiter.acquire("a", "Scheduled")
+        with self.assertRaises(RateLimitExceeded):
+            limiter.acquire("a", "Scheduled")
+        self.assertEqual(limiter.used("a"), 2)  # the refused call isn't counted
+
+    def test_limit_across_threads(self):
+        limiter = RateLimiter(TokenBucket(rate=1000, capacity=1000), limits={"a": 100})
+
+        def call(_):
+            try:
+                limiter.acquire("a", "Scheduled")
+                return True
+            except RateLimitExceeded:
+                return False
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            made = sum(executor.map(call, range(300)))
+        self.assertEqual(made, 100)
+        self.assertEqual(limiter.usage(), {"a": {"Scheduled": 100}})
+
+    def test_sqlite_shared(self):
+        path = os.path.join(self.directory, "rate")
+        first = RateLimiter(SqliteTokenBucket(path, rate=0.01, capacity=3), block=False, limits={"a": 2})
+        second = RateLimiter(SqliteTokenBucket(path, rate=0.01, capacity=3), block=False, limits={"a": 2})
+        first.acquire("a", "Scheduled")
+        second.acquire("a", "Scheduled")
+        with self.assertRaises(RateLimitExceeded):  # the limit is shared
+            first.acquire("a", "Scheduled")
+        second.acquire("b", "Scheduled")
+        with self.assertRaises(RateLimitExceeded):  # and so is the bucket
+            first.acquire("b", "Scheduled")
+        self.assertEqual(first.usage(), {"a": {"Scheduled": 2}, "b": {"Scheduled": 1}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+# encoding: utf-8
+'''
+Resilience: retries, the retry budget and the circuit breakers.
+'''
+from __future__ import unicode_literals, division, print_function, absolute_import
+
+import unittest
+
+import requests
+
+from flightstats.ratelimit import RateLimitExceeded
+from flightstats.resilience import CircuitBreaker, CircuitOpenError, Resilience, RetryBudget
+
+
+class Calls(object):
+    """raises the given errors one per call, then returns "ok\""""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.made = 0
+
+    def __call__(self):
+        self.made += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+class ResilienceTest(unittest.TestCase):
+
+    def resilience(self, **kwargs):
+        kwargs.setdefault("base_delay", 0)
+        return Resilience(**kwargs)
+
+    def test_retries_transient_errors(self):
+        calls = Calls(requests.ConnectionError(), requests.Timeout())
+        self.assertEqual(self.resilience().call("Scheduled", calls), "ok")
+        self.assertEqual(calls.made, 3)
+
+    def test_gives_up_after_max_attempts(self):
+        calls = Calls(*[requests.ConnectionError()] * 5)
+        with self.assertRaises(requests.ConnectionError):
+            self.resilience(max_attempts=2).call("Scheduled", calls)
+        self.assertEqual(calls.made, 2)
+
+    def test_no_retry_without_budget(self):
+        calls = Calls(requests.ConnectionError())
+        with self.assertRaises(requests.ConnectionError):
+            self.resilience(budget=RetryBudget(min_tokens=0)).call("Scheduled", calls)
+        self.assertEqual(calls.made, 1)
+
+    def test_breaker_opens_per_endpoint(self):
+        resilience = self.resilience(max_attempts=1, failure_threshold=2)
+        for _ in range(2):
+            with self.assertRaises(requests.ConnectionError):
+                resilience.call("Scheduled", Calls(requests.ConnectionError()))
+        calls = Calls()
+        with self.assertRaises(CircuitOpenError):
+            resilience.call("Scheduled", calls)
+        self.assertEqual(calls.made, 0)
+        self.assertEqual(resilience.call("AirportInfo", calls), "ok")
+
+    def test_local_errors_leave_the_breaker_alone(self):
+        resilience = self.resilience(max_attempts=1, failure_threshold=1, reset_timeout=0)
+        with self.assertRaises(requests.ConnectionError):
+            resilience.call("Scheduled", Calls(requests.ConnectionError()))
+        breaker = resilience.breaker("Scheduled")
+        with self.assertRaises(RateLimitExceeded):  # takes the half open trial without making a request
+            resilience.call("Scheduled", Calls(RateLimitExceeded()))
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertEqual(resilience.call("Scheduled", Calls()), "ok")  # the trial slot was given back
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+
+class CircuitBreakerTest(unittest.TestCase):
+
+    def test_half_open_lets_one_trial_through(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.before_call()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        breaker.before_call()
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+
+if __name__ == '__main__':
+    unittest.main()
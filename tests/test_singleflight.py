@@ -0,0 +1,69 @@
+# encoding: utf-8
+'''
+SingleFlight: concurrent calls with the same key share one call.
+'''
+from __future__ import unicode_literals, division, print_function, absolute_import
+
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from flightstats.singleflight import SingleFlight
+
+FOLLOWERS = 7
+
+
+class SingleFlightTest(unittest.TestCase):
+
+    def setUp(self):
+        self.flight = SingleFlight()
+        self.release = threading.Event()
+        self.made = []
+
+    def slow(self, result=None, error=None):
+        """a call that returns result (or raises error) once self.release is set"""
+        def call():
+            self.made.append(1)
+            self.release.wait(5)
+            if error is not None:
+                raise error
+            return result
+        return call
+
+    def run_concurrently(self, key, func):
+        """do(key, func) in 1 + FOLLOWERS threads, released once all of them joined"""
+        def do(_):
+            try:
+                return self.flight.do(key, func)
+            except Exception as error:  # pylint:disable=broad-except
+                return error
+        with ThreadPoolExecutor(max_workers=1 + FOLLOWERS) as executor:
+            results = executor.map(do, range(1 + FOLLOWERS))
+            while self.flight.joined < FOLLOWERS:
+                threading.Event().wait(0.001)
+            self.release.set()
+            return list(results)
+
+    def test_one_call_copies_of_the_result(self):
+        results = self.run_concurrently("a", self.slow(result={"flights": [1]}))
+        self.assertEqual(len(self.made), 1)
+        self.assertEqual((self.flight.calls, self.flight.joined), (1, FOLLOWERS))
+        self.assertEqual(results, [{"flights": [1]}] * (1 + FOLLOWERS))
+        results[0]["flights"].append(2)
+        self.assertEqual(results[1], {"flights": [1]})
+        self.assertEqual(len(set(id(result) for result in results)), 1 + FOLLOWERS)
+
+    def test_error_raised_to_everyone(self):
+        error = ValueError("down")
+        self.assertEqual(self.run_concurrently("a", self.slow(error=error)), [error] * (1 + FOLLOWERS))
+        self.assertEqual(len(self.made), 1)
+
+    def test_nothing_cached(self):
+        self.release.set()
+        self.assertEqual(self.flight.do("a", self.slow(result=1)), 1)
+        self.assertEqual(self.flight.do("a", self.slow(result=2)), 2)
+        self.assertEqual(len(self.made), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()